@@ -76,7 +76,7 @@ echo.
 echo Installing Python packages...
 echo This may take a few minutes...
 echo.
-python -m pip install flask flask-socketio samsung-mdc schedule requests python-socketio psutil
+python -m pip install flask flask-socketio samsung-mdc requests python-socketio psutil
 echo.
 echo [OK] Dependencies installed
 echo.
@@ -3,28 +3,46 @@ Sistema Completo di Controllo Display Samsung
 con Dashboard, Scheduling, Notifiche e Monitoring
 
 Requisiti:
-pip install flask flask-socketio samsung-mdc schedule requests python-socketio
+pip install flask flask-socketio samsung-mdc requests python-socketio
 
 File necessari:
 - display_system.py (questo file)
 - config.json (configurazione)
 """
 
-from flask import Flask, render_template_string, jsonify, request, session, redirect, url_for
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template_string, jsonify, request, session, redirect, url_for
+from flask_socketio import SocketIO, emit, join_room
 from functools import wraps
 import hashlib
 import secrets
 import json
 import logging
+import logging.handlers
+import gzip
+import zlib
+import shutil
 from datetime import datetime, timedelta
+from collections import deque
+from array import array
+import bisect
+import heapq
+import random
+import re
 import threading
 import time
-import schedule
 import os
 import subprocess
 import psutil
+import requests
 import asyncio
+import atexit
+import queue
+import smtplib
+from email.mime.text import MIMEText
+import concurrent.futures
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
 
 
 try:
@@ -33,56 +51,411 @@ except ImportError:
     print("ERRORE: Installa samsung-mdc con: pip install samsung-mdc")
     exit(1)
 
-def run_async(coro):
-    try:
+class AsyncLoopThread:
+    """
+    Event loop asyncio dedicato, condiviso da tutto il processo.
+
+    I thread sincroni (Flask, scheduler, watchdog) sottomettono coroutine
+    con run(); le connessioni MDC del pool vivono tutte su questo loop.
+    """
+
+    def __init__(self, name='asyncio-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def in_loop_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Sottomette una coroutine e restituisce un concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Esegue una coroutine sul loop e ne attende il risultato"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("run() chiamato dal thread del loop: usare await")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Operazione asincrona oltre il timeout di {timeout}s")
+        except BaseException:
+            future.cancel()
+            raise
+
+    def call_every(self, interval, coro_func):
+        """Esegue periodicamente coro_func() sul loop"""
+        async def _periodic():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await coro_func()
+                except Exception as e:
+                    logger.error(f"Errore task periodico {coro_func.__name__}: {e}")
+
+        return self.submit(_periodic())
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# Istanza globale event loop
+event_loop = AsyncLoopThread()
+
+def run_async(coro, timeout=None):
+    """Esegue una coroutine sul loop condiviso (timeout di default da config mdc)"""
+    if timeout is None:
+        timeout = MDC_CONFIG.get('command_timeout', 30)
+    return event_loop.run(coro, timeout)
+
+class _PoolSlot:
+    """Slot del pool: connessione MDC (riapribile) di un singolo IP"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.lock = asyncio.Lock()
+        self.mdc = None
+        self.display_id = 0
+        self.last_used = 0.0
+        self.last_probe = 0.0
+
+
+class DisplayUnreachableError(ConnectionError):
+    """Il display non accetta connessioni TCP sulla porta MDC"""
+
+
+class ReachabilityProbe:
+    """
+    Verifica di raggiungibilità leggera: sola apertura TCP verso la porta MDC
+    con timeout stretto, esito in cache per ttl secondi. Un display scollegato
+    fallisce in fretta invece di attendere il connect_timeout della libreria.
+    """
+
+    def __init__(self, port=1515, timeout=1.0, ttl=5):
+        self.port = port
+        self.timeout = timeout
+        self.ttl = ttl
+        # ip → (raggiungibile, istante monotonic della verifica)
+        self._results = {}
+        self._inflight = {}
+
+    def cached(self, ip):
+        """Esito in cache (None se assente o scaduto)"""
+        entry = self._results.get(ip)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            return entry[0]
+        return None
+
+    async def check(self, ip):
+        """True se la porta MDC accetta connessioni (verifiche concorrenti condivise)"""
+        reachable = self.cached(ip)
+        if reachable is not None:
+            return reachable
+        inflight = self._inflight.get(ip)
+        if inflight is None:
+            inflight = self._inflight[ip] = asyncio.ensure_future(self._connect(ip))
+            inflight.add_done_callback(lambda _: self._inflight.pop(ip, None))
+        return await asyncio.shield(inflight)
+
+    async def _connect(self, ip):
+        started = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            reachable = False
+        else:
+            reachable = True
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        REACHABILITY_DURATION.labels(ip, 'reachable' if reachable else 'unreachable').observe(
+            time.perf_counter() - started
+        )
+        self._results[ip] = (reachable, time.monotonic())
+        return reachable
+
+    def unreachable_error(self, ip):
+        return DisplayUnreachableError(f"{ip}:{self.port} non raggiungibile")
+
+
+class MDCConnectionPool:
+    """
+    Pool di sessioni MDC persistenti indicizzate per IP del display.
+
+    Ogni IP ha una sola connessione TCP, serializzata da un lock: il
+    protocollo MDC è request/response e il display accetta poche sessioni.
+    Le sessioni inattive oltre keepalive_interval vengono verificate prima
+    dell'uso, quelle oltre idle_timeout vengono chiuse.
+    """
+
+    CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, EOFError)
+
+    def __init__(self, keepalive_interval=60, idle_timeout=300, connect_timeout=5, timeout=5,
+                 reachability=None):
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.reachability = reachability
+        self._slots = {}
+        self._guard = threading.Lock()
+
+    def _slot(self, ip):
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            slot = self._slots.get(ip)
+            # Una connessione asyncio è legata al loop che l'ha aperta
+            if slot is None or slot.loop is not loop:
+                slot = self._slots[ip] = _PoolSlot(loop)
+            return slot
+
+    def unreachable(self, ip):
+        """Errore per un display irraggiungibile, conteggiato come connessione fallita"""
+        MDC_CONNECTION_FAILURES.inc()
+        return self.reachability.unreachable_error(ip)
+
+    async def _open(self, ip, slot):
+        if self.reachability is not None and not await self.reachability.check(ip):
+            raise self.unreachable(ip)
+        mdc = MDC(ip, timeout=self.timeout, connect_timeout=self.connect_timeout, verbose=False)
+        try:
+            await mdc.open()
+        except Exception:
+            MDC_CONNECTION_FAILURES.inc()
+            raise
+        slot.mdc = mdc
+        slot.last_used = slot.last_probe = time.monotonic()
+        logger.info(f"Sessione MDC aperta verso {ip}")
+
+    async def _close(self, slot):
+        mdc, slot.mdc = slot.mdc, None
+        if mdc is None:
+            return
+        try:
+            await mdc.close()
+        except Exception:
+            pass
+
+    async def _probe(self, slot):
+        """Health probe leggero sulla sessione esistente"""
+        try:
+            await slot.mdc.power(slot.display_id)
+            slot.last_probe = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def _ensure_healthy(self, ip, slot):
+        if slot.mdc is not None:
+            now = time.monotonic()
+            if now - slot.last_used > self.idle_timeout:
+                await self._close(slot)
+            elif (now - max(slot.last_used, slot.last_probe) > self.keepalive_interval
+                    and not await self._probe(slot)):
+                logger.warning(f"Sessione MDC verso {ip} non più valida, riconnessione")
+                await self._close(slot)
+        if slot.mdc is None:
+            await self._open(ip, slot)
+
+    @asynccontextmanager
+    async def session(self, ip, display_id=0):
+        """Restituisce una sessione MDC calda per l'IP richiesto"""
+        slot = self._slot(ip)
+        async with slot.lock:
+            slot.display_id = display_id
+            await self._ensure_healthy(ip, slot)
+            try:
+                yield slot.mdc
+            except BaseException as e:
+                # Errore di rete o comando interrotto (cancellazione, timeout
+                # del chiamante) a metà risposta: la sessione non è più affidabile.
+                # Un errore applicativo (es. NAK del display) la lascia utilizzabile.
+                if isinstance(e, self.CONNECTION_ERRORS):
+                    MDC_CONNECTION_FAILURES.inc()
+                    await self._close(slot)
+                elif not isinstance(e, Exception):
+                    await self._close(slot)
+                raise
+            finally:
+                slot.last_used = time.monotonic()
+
+    async def maintain(self):
+        """Keepalive ed eviction delle sessioni del loop corrente"""
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            slots = [(ip, s) for ip, s in self._slots.items() if s.loop is loop]
+
+        for ip, slot in slots:
+            if slot.mdc is None or slot.lock.locked():
+                continue
+            async with slot.lock:
+                if slot.mdc is None:
+                    continue
+                now = time.monotonic()
+                if now - slot.last_used > self.idle_timeout:
+                    logger.info(f"Sessione MDC verso {ip} inattiva, chiusura")
+                    await self._close(slot)
+                elif now - slot.last_probe > self.keepalive_interval:
+                    if not await self._probe(slot):
+                        logger.warning(f"Keepalive MDC verso {ip} fallito, sessione chiusa")
+                        await self._close(slot)
+
+    async def close_all(self):
+        """Chiude tutte le sessioni del loop corrente"""
         loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
+        with self._guard:
+            slots = [s for s in self._slots.values() if s.loop is loop]
+        for slot in slots:
+            async with slot.lock:
+                await self._close(slot)
+
+
+# Logger dei comandi MDC: a livello DEBUG solo con logging.mdc_debug
+mdc_logger = logging.getLogger('DisplayControl.MDC')
+
+def _mdc_name(value):
+    """Valore di una risposta MDC (enum o intero) come stringa minuscola"""
+    return str(getattr(value, 'name', value)).lower()
+
+@dataclass
+class DisplaySnapshot:
+    """Stato completo del display letto in una sola sessione MDC"""
+
+    # Campi di display_status che indicano un guasto quando valorizzati
+    ERROR_FIELDS = ('lamp', 'temperature', 'brightness_sensor', 'no_sync', None, 'fan')
+
+    power: str = 'unknown'
+    source: str = 'unknown'
+    volume: Optional[int] = None
+    mute: Optional[bool] = None
+    temperature: Optional[int] = None
+    errors: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_mdc(cls, status, display_status=None):
+        """
+        Costruisce lo snapshot dalle risposte MDC:
+        status → (power, volume, mute, input source, ...),
+        display_status → (lamp, temperature, brightness sensor, no sync, current temp, fan).
+        """
+        snapshot = cls(
+            power=_mdc_name(status[0]),
+            volume=int(status[1]) if len(status) > 1 else None,
+            mute=bool(getattr(status[2], 'value', status[2])) if len(status) > 2 else None,
+            source=_mdc_name(status[3]) if len(status) > 3 else 'unknown'
+        )
+        if display_status:
+            for name, value in zip(cls.ERROR_FIELDS, display_status):
+                if name and getattr(value, 'value', value):
+                    snapshot.errors.append(name)
+            if len(display_status) > 4:
+                snapshot.temperature = int(display_status[4])
+        return snapshot
+
+    def to_dict(self):
+        return asdict(self)
+
+async def _execute_mdc(mdc, display_id, command, *args):
+    if command == "power_on":
+        mdc_logger.debug("Send: POWER ON")
+        await mdc.send(0x11, display_id, [1])
+
+    elif command == "power_off":
+        mdc_logger.debug("Send: POWER OFF")
+        await mdc.send(0x11, display_id, [0])
+
+    elif command == "source":
+        src = args[0].upper()
+        mdc_logger.debug("Send: CHANGE SOURCE → %s", src)
+        await mdc.input_source(display_id, [src])
+
+    elif command == "status":
+        # Due getter sulla stessa sessione: status (power, volume, mute,
+        # sorgente) e display_status (temperatura e guasti)
+        mdc_logger.debug("Send: STATUS REQUEST")
+        status = await mdc.status(display_id)
+        mdc_logger.debug("Status result: %s", status)
+        try:
+            display_status = await mdc.display_status(display_id)
+            mdc_logger.debug("Display status result: %s", display_status)
+        except MDCConnectionPool.CONNECTION_ERRORS:
+            raise
+        except Exception as e:
+            # Non tutti i modelli supportano display_status
+            mdc_logger.debug("Display status non disponibile: %s", e)
+            display_status = None
+        return DisplaySnapshot.from_mdc(status, display_status)
 
-    if loop and loop.is_running():
-        future = asyncio.run_coroutine_threadsafe(coro, loop)
-        return future.result()
     else:
-        return asyncio.run(coro)
+        mdc_logger.warning("Unknown command: %s", command)
 
 async def mdc_command(ip, display_id, command, *args):
     """
-    Versione di debug: mostra quale comando arriva e cosa prova a inviare.
+    Esegue un comando MDC su una sessione del pool.
+    Se la sessione cade viene riaperta e il comando ritentato una volta.
     """
-    print("=" * 60)
-    print(f"[MDC DEBUG] → Command received: {command}")
-    print(f"[MDC DEBUG] → Target IP: {ip}, Display ID: {display_id}")
-    print(f"[MDC DEBUG] → Extra args: {args}")
-    print("=" * 60)
+    mdc_logger.debug("Command %s → %s (display id %s), args %s", command, ip, display_id, args)
 
+    started = time.perf_counter()
     try:
-        async with MDC(ip, verbose=True) as mdc:
-            if command == "power_on":
-                print("[MDC DEBUG] Would send: POWER ON")
-                await mdc.send(0x11, display_id, [1])
-                #await asyncio.sleep(0.3)
-
-            elif command == "power_off":
-                print("[MDC DEBUG] Would send: POWER OFF")
-                await mdc.send(0x11, display_id, [0])
-                #await asyncio.sleep(0.3)
-
-            elif command == "source":
-                src = args[0].upper()
-                print(f"[MDC DEBUG] Would send: CHANGE SOURCE → {src}")
-                await mdc.input_source(display_id, [src])
-
-            elif command == "status":
-                print("[MDC DEBUG] Would send: STATUS REQUEST")
-                result = await mdc.status(display_id)
-                print(f"[MDC DEBUG] Status result: {result}")
+        # Display già verificato irraggiungibile: errore immediato fino a scadenza cache
+        if mdc_pool.reachability is not None and mdc_pool.reachability.cached(ip) is False:
+            raise mdc_pool.unreachable(ip)
+        for attempt in range(2):
+            try:
+                async with mdc_pool.session(ip, display_id) as mdc:
+                    result = await _execute_mdc(mdc, display_id, command, *args)
+                MDC_COMMANDS.labels(command, 'success').inc()
                 return result
-
-            else:
-                print(f"[MDC DEBUG] ❌ Unknown command: {command}")
-
-    except Exception as e:
-        print(f"[MDC DEBUG] ❌ Exception while executing {command}: {e}")
+            except DisplayUnreachableError:
+                # Esito della verifica di raggiungibilità: ritentare darebbe lo stesso errore
+                raise
+            except MDCConnectionPool.CONNECTION_ERRORS as e:
+                if attempt:
+                    mdc_logger.debug("Exception while executing %s: %s", command, e)
+                    raise
+                mdc_logger.debug("Sessione %s persa (%s), riconnessione...", ip, e)
+    except BaseException as e:
+        if not isinstance(e, MDCConnectionPool.CONNECTION_ERRORS):
+            mdc_logger.debug("Exception while executing %s: %s", command, e)
+        MDC_COMMANDS.labels(command, 'error').inc()
+        raise
+    finally:
+        MDC_COMMAND_DURATION.labels(command).observe(time.perf_counter() - started)
 
 # =====================================================================
 # CONFIGURAZIONE
@@ -92,15 +465,163 @@ CONFIG_FILE = 'config.json'
 LOG_DIR = 'logs'
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Setup logging
+class SegmentedLogHandler(logging.handlers.BaseRotatingHandler):
+    """
+    File di log con rotazione per dimensione e per giorno. I segmenti chiusi
+    vengono compressi (.gz) e registrati in index.json con il loro intervallo
+    temporale, così le ricerche per data aprono solo i segmenti necessari.
+    """
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    # Attesa prima di ritentare una rotazione fallita (secondi)
+    ROLLOVER_RETRY = 60
+
+    def __init__(self, filename, max_bytes=5 * 1024 * 1024, backup_count=60, rotate_daily=True):
+        super().__init__(filename, 'a', encoding='utf-8', delay=False)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_daily = rotate_daily
+        self.index_path = os.path.join(os.path.dirname(self.baseFilename), 'index.json')
+        self.segments = self._load_index()
+        self.segment_start = self._current_start()
+        self._retry_rollover = 0
+
+    def configure(self, max_bytes=None, backup_count=None, rotate_daily=None):
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if backup_count is not None:
+            self.backup_count = backup_count
+        if rotate_daily is not None:
+            self.rotate_daily = rotate_daily
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.segments, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _current_start(self):
+        """Inizio del segmento corrente: timestamp della prima riga del file"""
+        try:
+            with open(self.baseFilename, 'r', encoding='utf-8', errors='replace') as f:
+                return datetime.strptime(f.readline()[:19], self.TIME_FORMAT)
+        except (OSError, ValueError):
+            return datetime.now()
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if record.created < self._retry_rollover:
+            return False
+        if self.rotate_daily and datetime.fromtimestamp(record.created).date() != self.segment_start.date():
+            return True
+        if self.max_bytes > 0:
+            self.stream.seek(0, os.SEEK_END)
+            if self.stream.tell() >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        end = datetime.now()
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            base, _ = os.path.splitext(self.baseFilename)
+            name = f"{base}-{self.segment_start.strftime('%Y%m%d-%H%M%S')}"
+            n = 1
+            segment = f"{name}.log"
+            while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+                segment = f"{name}-{n}.log"
+                n += 1
+
+            # Prima si sposta il file corrente: se è aperto da un lettore (Windows)
+            # la rotazione fallisce senza lasciare archivi a metà e si riprova più tardi
+            try:
+                os.replace(self.baseFilename, segment)
+            except OSError as e:
+                self._retry_rollover = time.time() + self.ROLLOVER_RETRY
+                self.stream = self._open()
+                self.handleError(logging.makeLogRecord({'msg': f"Rotazione log rinviata: {e}"}))
+                return
+
+            archive = segment + '.gz'
+            try:
+                with open(segment, 'rb') as src, gzip.open(archive, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            except OSError:
+                # Compressione fallita: il segmento resta non compresso ma indicizzato
+                try:
+                    os.remove(archive)
+                except OSError:
+                    pass
+            else:
+                try:
+                    os.remove(segment)
+                except OSError:
+                    pass
+                segment = archive
+
+            self.segments.append({
+                'file': os.path.basename(segment),
+                'start': self.segment_start.strftime(self.TIME_FORMAT),
+                'end': end.strftime(self.TIME_FORMAT)
+            })
+            while len(self.segments) > self.backup_count:
+                old = self.segments.pop(0)
+                try:
+                    os.remove(os.path.join(os.path.dirname(self.baseFilename), old['file']))
+                except OSError:
+                    pass
+            try:
+                self._save_index()
+            except OSError:
+                pass
+
+        self._retry_rollover = 0
+        self.segment_start = end
+        self.stream = self._open()
+
+    def segments_between(self, start=None, end=None):
+        """Percorsi dei segmenti (dal più vecchio) che si sovrappongono a [start, end]"""
+        log_dir = os.path.dirname(self.baseFilename)
+        paths = [
+            os.path.join(log_dir, seg['file'])
+            for seg in self.segments
+            if (end is None or seg['start'] <= end) and (start is None or seg['end'] >= start)
+        ]
+        if end is None or self.segment_start.strftime(self.TIME_FORMAT) <= end:
+            paths.append(self.baseFilename)
+        return paths
+
+log_file_handler = SegmentedLogHandler(os.path.join(LOG_DIR, 'display.log'))
+log_console_handler = logging.StreamHandler()
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_file_handler.setFormatter(_log_formatter)
+log_console_handler.setFormatter(_log_formatter)
+
+# Setup logging: i thread applicativi accodano soltanto i record, la scrittura
+# su file e console avviene nel thread del QueueListener
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue, log_file_handler, log_console_handler, respect_handler_level=True
+)
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(LOG_DIR, 'display.log')),
-        logging.StreamHandler()
-    ]
+    handlers=[log_queue_handler]
 )
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger('DisplayControl')
 
 # =====================================================================
@@ -118,12 +639,63 @@ DEFAULT_CONFIG = {
         "power_on": "08:00",
         "power_off": "20:00",
         "days": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday"],
-        "source_on_startup": "hdmi1"
+        "source_on_startup": "hdmi1",
+        "holidays": []
     },
     "watchdog": {
         "enabled": True,
         "check_interval": 300,
-        "max_retry": 3
+        "max_retry": 3,
+        "fast_interval": 30,
+        "max_backoff": 1800,
+        "off_hours_factor": 4,
+        "jitter": 0.1
+    },
+    "xibo": {
+        "enabled": True,
+        "path": "C:\\Program Files\\Xibo Player\\XiboClient.exe"
+    },
+    "logging": {
+        "max_bytes": 5242880,
+        "backup_count": 60,
+        "rotate_daily": True,
+        "mdc_debug": False
+    },
+    "monitor": {
+        "sample_interval": 5
+    },
+    "timeseries": {
+        "capacity": 10080,
+        "flush_interval": 300
+    },
+    "metrics": {
+        "token": ""
+    },
+    "broadcast": {
+        "coalesce_window": 0.5,
+        "history": 50
+    },
+    "status_watcher": {
+        "interval": 30
+    },
+    "status_cache": {
+        "ttl": 10,
+        "stale_while_revalidate": False
+    },
+    "fleet": {
+        "max_concurrency": 10,
+        "displays": [],
+        "groups": {}
+    },
+    "mdc": {
+        "keepalive_interval": 60,
+        "idle_timeout": 300,
+        "connect_timeout": 5,
+        "timeout": 5,
+        "command_timeout": 30,
+        "port": 1515,
+        "probe_timeout": 1,
+        "probe_ttl": 5
     },
     "notifications": {
         "telegram": {
@@ -138,6 +710,15 @@ DEFAULT_CONFIG = {
             "username": "",
             "password": "",
             "to_email": ""
+        },
+        "retry": {
+            "attempts": 3,
+            "backoff": 2
+        },
+        "aggregation": {
+            "dedupe_window": 300,
+            "batch_window": 5,
+            "max_batch": 20
         }
     },
     "security": {
@@ -146,333 +727,2443 @@ DEFAULT_CONFIG = {
     }
 }
 
-# Carica o crea configurazione
-if os.path.exists(CONFIG_FILE):
-    with open(CONFIG_FILE, 'r') as f:
-        CONFIG = json.load(f)
-        logger.info("Configurazione caricata da file")
-else:
-    CONFIG = DEFAULT_CONFIG
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(CONFIG, f, indent=2)
-    logger.info("Creato file configurazione default")
+# Carica o crea configurazione
+if os.path.exists(CONFIG_FILE):
+    with open(CONFIG_FILE, 'r') as f:
+        CONFIG = json.load(f)
+        logger.info("Configurazione caricata da file")
+else:
+    CONFIG = DEFAULT_CONFIG
+    with open(CONFIG_FILE, 'w') as f:
+        json.dump(CONFIG, f, indent=2)
+    logger.info("Creato file configurazione default")
+
+
+def merge_config(base, update):
+    """Restituisce una copia di base con le chiavi di update unite ricorsivamente.
+
+    Le chiavi assenti in update (es. schedule.holidays, non gestito dal form
+    della dashboard) restano quelle di base.
+    """
+    merged = dict(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+LOGGING_CONFIG = CONFIG.get('logging', {})
+log_file_handler.configure(
+    max_bytes=LOGGING_CONFIG.get('max_bytes'),
+    backup_count=LOGGING_CONFIG.get('backup_count'),
+    rotate_daily=LOGGING_CONFIG.get('rotate_daily')
+)
+mdc_logger.setLevel(logging.DEBUG if LOGGING_CONFIG.get('mdc_debug', False) else logging.INFO)
+
+# =====================================================================
+# FLASK APP
+# =====================================================================
+
+app = Flask(__name__)
+app.secret_key = secrets.token_hex(32)
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+socketio = SocketIO(app, cors_allowed_origins="*")
+
+# =====================================================================
+# METRICHE (Prometheus / OpenMetrics)
+# =====================================================================
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        # Senza lock: sotto il GIL al massimo si perde un incremento concorrente
+        self.value += amount
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metric:
+    """Metrica con label; i figli vengono creati una volta e poi riusati"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = values
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_str(self, values, extra=''):
+        pairs = [f'{n}="{v}"' for n, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f'{self.name}_total{self._label_str(values)} {child.value}'
+
+class Histogram(Metric):
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else bound
+                labels = self._label_str(values, 'le="%s"' % le)
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{self._label_str(values)} {child.sum}'
+            yield f'{self.name}_count{self._label_str(values)} {child.count}'
+
+class CallbackMetric:
+    """Metrica calcolata al momento dello scrape: callback() → [(valori label, valore)]"""
+
+    def __init__(self, name, documentation, labelnames, callback, type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type = type
+
+    def samples(self):
+        sample = self.name + '_total' if self.type == 'counter' else self.name
+        for values, value in self.callback():
+            pairs = ','.join(f'{n}="{v}"' for n, v in zip(self.labelnames, values))
+            yield f'{sample}{{{pairs}}} {value}' if pairs else f'{sample} {value}'
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                logger.error(f"Errore metrica {metric.name}: {e}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+metrics_registry = MetricsRegistry()
+
+MDC_COMMAND_DURATION = metrics_registry.register(Histogram(
+    'mdc_command_duration_seconds', 'Durata dei comandi MDC', ['command']
+))
+MDC_COMMANDS = metrics_registry.register(Counter(
+    'mdc_commands', 'Comandi MDC eseguiti', ['command', 'result']
+))
+COMMANDS_COALESCED = metrics_registry.register(Counter(
+    'display_commands_coalesced', 'Comandi in coda uniti (dedupe) o sostituiti (supersede)', ['kind']
+))
+MDC_CONNECTION_FAILURES = metrics_registry.register(Counter(
+    'mdc_connection_failures', 'Errori di connessione verso i display'
+))
+REACHABILITY_DURATION = metrics_registry.register(Histogram(
+    'mdc_reachability_duration_seconds', 'Durata della verifica TCP verso la porta MDC', ['ip', 'result'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+))
+WATCHDOG_ACTIONS = metrics_registry.register(Counter(
+    'watchdog_actions', 'Azioni del watchdog (unreachable, power_cycle, repower, alert)', ['action']
+))
+NOTIFICATION_DURATION = metrics_registry.register(Histogram(
+    'notification_send_duration_seconds', 'Durata invio notifiche (retry inclusi)', ['channel']
+))
+NOTIFICATIONS = metrics_registry.register(Counter(
+    'notifications', 'Notifiche inviate', ['channel', 'result']
+))
+
+# =====================================================================
+# POOL CONNESSIONI MDC
+# =====================================================================
+
+MDC_CONFIG = CONFIG.get('mdc', DEFAULT_CONFIG['mdc'])
+mdc_pool = MDCConnectionPool(
+    keepalive_interval=MDC_CONFIG.get('keepalive_interval', 60),
+    idle_timeout=MDC_CONFIG.get('idle_timeout', 300),
+    connect_timeout=MDC_CONFIG.get('connect_timeout', 5),
+    timeout=MDC_CONFIG.get('timeout', 5),
+    reachability=ReachabilityProbe(
+        port=MDC_CONFIG.get('port', 1515),
+        timeout=MDC_CONFIG.get('probe_timeout', 1),
+        ttl=MDC_CONFIG.get('probe_ttl', 5)
+    )
+)
+
+# =====================================================================
+# EVENT STORE
+# =====================================================================
+
+DATA_DIR = 'data'
+os.makedirs(DATA_DIR, exist_ok=True)
+
+class EventStore:
+    """
+    Archivio append-only JSON-lines di comandi, verifiche stato, azioni del
+    watchdog e notifiche. Per ogni tipo di evento un indice in memoria
+    (timestamp, offset) permette query per intervallo senza scandire il file.
+    La scrittura avviene in un thread dedicato.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._index = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._load_index()
+
+    def _index_event(self, event_type, t, offset):
+        times, offsets = self._index.setdefault(event_type, (array('d'), array('q')))
+        if times and t < times[-1]:
+            # Eventi registrati da thread diversi possono arrivare fuori ordine di poco
+            pos = bisect.bisect_right(times, t)
+            times.insert(pos, t)
+            offsets.insert(pos, offset)
+        else:
+            times.append(t)
+            offsets.append(offset)
+
+    def _load_index(self):
+        """Ricostruisce l'indice all'avvio (una sola lettura del file)"""
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    self._index_event(event['type'], event['t'], offset)
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+
+    def record(self, event_type, **fields):
+        """Registra un evento (non bloccante)"""
+        event = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            't': round(time.time(), 3),
+            'type': event_type
+        }
+        event.update(fields)
+        self._queue.put(event)
+        self.start()
+
+    def _run(self):
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            while True:
+                event = self._queue.get()
+                try:
+                    line = json.dumps(event, default=str, ensure_ascii=False).encode('utf-8') + b'\n'
+                    offset = f.tell()
+                    f.write(line)
+                    f.flush()
+                    with self._lock:
+                        self._index_event(event['type'], event['t'], offset)
+                except Exception as e:
+                    logger.error(f"Errore scrittura evento: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='event-store', daemon=True)
+            self._thread.start()
+
+    def types(self):
+        with self._lock:
+            return {event_type: len(times) for event_type, (times, _) in self._index.items()}
+
+    def _walk_back(self, times, offsets, lo, hi, chunk):
+        """(timestamp, offset) da hi-1 a lo, copiati dall'indice a blocchi di chunk"""
+        while hi > lo:
+            with self._lock:
+                first = max(lo, hi - chunk)
+                block = list(zip(times[first:hi], offsets[first:hi]))
+            yield from reversed(block)
+            hi = first
+
+    def query(self, start=None, end=None, types=None, display=None, limit=500):
+        """Eventi in [start, end] (epoch), dal più recente, filtrati per tipo e display"""
+        ranges = []
+        with self._lock:
+            for event_type, (times, offsets) in self._index.items():
+                if types and event_type not in types:
+                    continue
+                lo = bisect.bisect_left(times, start) if start is not None else 0
+                hi = bisect.bisect_right(times, end) if end is not None else len(times)
+                if display is None:
+                    # Senza filtro sul contenuto bastano gli ultimi limit eventi di ogni tipo
+                    lo = max(lo, hi - limit)
+                ranges.append((times, offsets, lo, hi))
+
+        events = []
+        if not ranges or limit <= 0:
+            return events
+        # Merge dei tipi dal più recente; col filtro per display l'indice si scorre solo quanto serve
+        candidates = heapq.merge(
+            *(self._walk_back(times, offsets, lo, hi, limit) for times, offsets, lo, hi in ranges),
+            reverse=True
+        )
+        with open(self.path, 'rb') as f:
+            for _, offset in candidates:
+                f.seek(offset)
+                event = json.loads(f.readline())
+                if display is not None and event.get('display') != display:
+                    continue
+                events.append(event)
+                if len(events) >= limit:
+                    break
+        return events
+
+# Istanza globale event store
+event_store = EventStore(os.path.join(DATA_DIR, 'events.jsonl'))
+
+# =====================================================================
+# TIME SERIES
+# =====================================================================
+
+POWER_STATES = ('on', 'off', 'error', 'unknown')
+# Risoluzione → (durata bucket in secondi, numero di bucket conservati)
+TIMESERIES_RESOLUTIONS = {
+    'minute': (60, 1440),
+    'hour': (3600, 24 * 45),
+    'day': (86400, 400)
+}
+# Oltre questo intervallo tra due campioni il tempo non viene attribuito
+TIMESERIES_MAX_GAP = 900
+
+def classify_power(power):
+    """Riduce lo stato power (anche la stringa della risposta MDC) a on/off/error/unknown"""
+    value = str(power).lower()
+    if value in ('error', 'unreachable'):
+        return 'error'
+    if re.search(r'\boff\b', value):
+        return 'off'
+    if re.search(r'\bon\b', value):
+        return 'on'
+    return 'unknown'
+
+def _bucket_start(t, size):
+    if size == 86400:
+        # Giorni in ora locale
+        return datetime.fromtimestamp(t).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    return t - t % size
+
+class DisplayTimeSeries:
+    """
+    Ring buffer (array) dei campioni di stato di un display, con rollup per
+    minuto/ora/giorno aggiornati ad ogni campione. Ogni bucket è
+    [inizio, s_on, s_off, s_error, s_unknown, campioni, lat_sum, lat_count, lat_max].
+    """
+
+    def __init__(self, capacity=10080):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.states = array('b', bytes(capacity))
+        self.latencies = array('f', bytes(4 * capacity))
+        self.head = 0
+        self.count = 0
+        self.last_t = None
+        self.last_state = None
+        self.rollups = {
+            name: deque(maxlen=retention)
+            for name, (_, retention) in TIMESERIES_RESOLUTIONS.items()
+        }
+
+    def _bucket(self, resolution, t):
+        size = TIMESERIES_RESOLUTIONS[resolution][0]
+        start = _bucket_start(t, size)
+        buckets = self.rollups[resolution]
+        if buckets and buckets[-1][0] == start:
+            return buckets[-1], start, size
+        if buckets and buckets[-1][0] > start:
+            # Campione fuori ordine (cambio orologio): bucket esistente se c'è
+            for bucket in reversed(buckets):
+                if bucket[0] == start:
+                    return bucket, start, size
+            return [start, 0.0, 0.0, 0.0, 0.0, 0, 0.0, 0, 0.0], start, size
+        bucket = [start, 0.0, 0.0, 0.0, 0.0, 0, 0.0, 0, 0.0]
+        buckets.append(bucket)
+        return bucket, start, size
+
+    def _accumulate(self, t0, t1, state_index):
+        for resolution in self.rollups:
+            t = t0
+            while t < t1:
+                bucket, start, size = self._bucket(resolution, t)
+                segment_end = min(t1, start + size)
+                bucket[1 + state_index] += segment_end - t
+                t = segment_end
+
+    def add(self, t, state, latency_ms=None):
+        state_index = POWER_STATES.index(state)
+        i = self.head
+        self.times[i] = t
+        self.states[i] = state_index
+        self.latencies[i] = latency_ms if latency_ms is not None else -1
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+        # Il tempo dal campione precedente va allo stato precedente
+        if self.last_t is not None and t > self.last_t:
+            self._accumulate(self.last_t, min(t, self.last_t + TIMESERIES_MAX_GAP), self.last_state)
+
+        for resolution in self.rollups:
+            bucket = self._bucket(resolution, t)[0]
+            bucket[5] += 1
+            if latency_ms is not None:
+                bucket[6] += latency_ms
+                bucket[7] += 1
+                bucket[8] = max(bucket[8], latency_ms)
+
+        self.last_t = t
+        self.last_state = state_index
+
+    def samples(self):
+        """Campioni grezzi dal più vecchio: [(t, stato, latenza_ms)]"""
+        start = (self.head - self.count) % self.capacity
+        result = []
+        for n in range(self.count):
+            i = (start + n) % self.capacity
+            latency = self.latencies[i]
+            result.append((self.times[i], POWER_STATES[self.states[i]], latency if latency >= 0 else None))
+        return result
+
+    def series(self, resolution, start=None, end=None, points=None):
+        buckets = [
+            b for b in self.rollups[resolution]
+            if (start is None or b[0] >= _bucket_start(start, TIMESERIES_RESOLUTIONS[resolution][0]))
+            and (end is None or b[0] <= end)
+        ]
+        # Downsampling: unione di gruppi di bucket consecutivi
+        step = max(1, -(-len(buckets) // points)) if points else 1
+        result = []
+        for n in range(0, len(buckets), step):
+            group = buckets[n:n + step]
+            merged = [group[0][0]] + [sum(b[k] for b in group) for k in range(1, 8)] + [max(b[8] for b in group)]
+            total = sum(merged[1:5])
+            result.append({
+                't': merged[0],
+                'on': round(merged[1], 1),
+                'off': round(merged[2], 1),
+                'error': round(merged[3], 1),
+                'unknown': round(merged[4], 1),
+                'uptime': round(merged[1] / total, 4) if total else None,
+                'samples': merged[5],
+                'latency_avg': round(merged[6] / merged[7], 1) if merged[7] else None,
+                'latency_max': round(merged[8], 1) if merged[7] else None
+            })
+        return result
+
+    def to_dict(self):
+        return {
+            'samples': self.samples(),
+            'last_t': self.last_t,
+            'last_state': self.last_state,
+            'rollups': {name: list(buckets) for name, buckets in self.rollups.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data, capacity=10080):
+        series = cls(capacity)
+        for t, state, latency in data.get('samples', [])[-capacity:]:
+            i = series.head
+            series.times[i] = t
+            series.states[i] = POWER_STATES.index(state)
+            series.latencies[i] = latency if latency is not None else -1
+            series.head = (i + 1) % capacity
+            series.count = min(series.count + 1, capacity)
+        series.last_t = data.get('last_t')
+        series.last_state = data.get('last_state')
+        for name, buckets in data.get('rollups', {}).items():
+            if name in series.rollups:
+                series.rollups[name].extend(buckets)
+        return series
+
+class TimeSeriesStore:
+    """Serie temporali per display, salvate periodicamente su disco"""
+
+    def __init__(self, path, capacity=10080, flush_interval=300):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.displays = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.displays = {
+                key: DisplayTimeSeries.from_dict(item, self.capacity)
+                for key, item in data.items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Errore lettura serie temporali: {e}")
+
+    def record(self, key, power, latency_ms=None, t=None):
+        with self._lock:
+            series = self.displays.get(key)
+            if series is None:
+                series = self.displays[key] = DisplayTimeSeries(self.capacity)
+            series.add(t if t is not None else time.time(), classify_power(power), latency_ms)
+            self._dirty = True
+
+    def series(self, key, resolution, start=None, end=None, points=None):
+        with self._lock:
+            series = self.displays.get(key)
+            return series.series(resolution, start, end, points) if series else []
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: series.to_dict() for key, series in self.displays.items()}
+            self._dirty = False
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Errore salvataggio serie temporali: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='timeseries-flush', daemon=True)
+        self._thread.start()
+
+# Istanza globale serie temporali
+TIMESERIES_CONFIG = CONFIG.get('timeseries', DEFAULT_CONFIG['timeseries'])
+timeseries_store = TimeSeriesStore(
+    os.path.join(DATA_DIR, 'timeseries.json'),
+    capacity=TIMESERIES_CONFIG.get('capacity', 10080),
+    flush_interval=TIMESERIES_CONFIG.get('flush_interval', 300)
+)
+
+# =====================================================================
+# DISPLAY CONTROLLER
+# =====================================================================
+
+@dataclass
+class CommandOutcome:
+    """Esito di un comando eseguito dalla coda di un display"""
+
+    success: bool
+    result: object = None
+    error: Optional[BaseException] = None
+    latency: float = 0.0
+
+class _QueuedCommand:
+    __slots__ = ('command', 'args', 'future', 'waiters', 'started')
+
+    def __init__(self, command, args, future):
+        self.command = command
+        self.args = args
+        self.future = future
+        self.waiters = 0
+        self.started = False
+
+class DisplayCommandQueue:
+    """
+    Coda comandi di un display, sul loop condiviso: i comandi (API, scheduler,
+    watchdog, status watcher) vengono eseguiti uno alla volta e in ordine.
+
+    Un comando uguale all'ultimo in attesa non viene accodato di nuovo; uno
+    dello stesso tipo con argomenti diversi (es. due cambi sorgente di fila)
+    sostituisce l'ultimo in attesa e tutti i chiamanti ricevono l'esito del
+    comando eseguito. Comandi diversi (power_on/power_off) non si sostituiscono
+    mai: ogni chiamante riceve l'esito del proprio comando.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self._pending = deque()
+        self._worker = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _enqueue(self, command, args):
+        tail = self._pending[-1] if self._pending else None
+        if tail is not None and (tail.command, tail.args) == (command, args):
+            COMMANDS_COALESCED.labels('dedupe').inc()
+            return tail
+        if tail is not None and tail.command == command:
+            mdc_logger.debug("[%s] %s%s sostituito da %s%s", self.controller.key, command, tail.args, command, args)
+            COMMANDS_COALESCED.labels('supersede').inc()
+            tail.args = args
+            return tail
+
+        entry = _QueuedCommand(command, args, asyncio.get_running_loop().create_future())
+        self._pending.append(entry)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._drain())
+        return entry
+
+    async def run(self, command, *args):
+        """Accoda il comando e ne attende l'esito (CommandOutcome)"""
+        entry = self._enqueue(command, args)
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.future)
+        except asyncio.CancelledError:
+            # Nessuno attende più un comando non ancora partito: viene scartato
+            entry.waiters -= 1
+            if not entry.waiters and not entry.started and entry in self._pending:
+                self._pending.remove(entry)
+                entry.future.cancel()
+            raise
+
+    def submit(self, command, *args):
+        """Versione thread-safe di run(): concurrent.futures.Future da attendere o interrogare"""
+        return event_loop.submit(self.run(command, *args))
+
+    async def _drain(self):
+        while self._pending:
+            entry = self._pending.popleft()
+            entry.started = True
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    self.controller.execute(entry.command, *entry.args),
+                    MDC_CONFIG.get('command_timeout', 30)
+                )
+                outcome = CommandOutcome(True, result)
+            except asyncio.CancelledError:
+                entry.future.cancel()
+                raise
+            except Exception as e:
+                outcome = CommandOutcome(False, error=e)
+            outcome.latency = time.monotonic() - started
+            outcome.success = self.controller.apply_result(
+                entry.command, entry.args, outcome.result, outcome.error, outcome.latency
+            )
+            if not entry.future.done():
+                entry.future.set_result(outcome)
+
+class DisplayController:
+    def __init__(self, ip, key='main', name=None, display_id=0):
+        self.ip = ip
+        self.key = key
+        self.name = name or key
+        self.display_id = display_id
+        self.status = {
+            'power': 'unknown',
+            'source': 'unknown',
+            'volume': None,
+            'mute': None,
+            'temperature': None,
+            'errors': [],
+            'last_check': None,
+            'last_command': None,
+            'error_count': 0
+        }
+        # Ultimo DisplaySnapshot letto dal display
+        self.snapshot = None
+        # Coda comandi: esecuzione serializzata verso il display
+        self.commands = DisplayCommandQueue(self)
+        # Watchdog del display (assegnato da WatchdogSupervisor)
+        self.watchdog = None
+        # Cache stato: istante (monotonic) dell'ultima query e query in corso
+        self._status_checked_at = None
+        self._status_inflight = None
+        self._status_lock = threading.Lock()
+        
+    def connect(self, retries=3):
+        """Connessione al display con retry"""
+        for i in range(retries):
+            try:
+                display = MDC(self.ip, verbose=False)
+                return display
+            except Exception as e:
+                logger.warning(f"Tentativo connessione {i+1}/{retries} fallito: {e}")
+                if i < retries - 1:
+                    time.sleep(2)
+        return None
+
+    async def execute(self, command, *args):
+        """Invia il comando MDC (da eseguire sul loop condiviso)"""
+        return await mdc_command(self.ip, self.display_id, command, *args)
+
+    def apply_result(self, command, args, result=None, error=None, latency=None):
+        """Aggiorna lo stato locale con l'esito di un comando"""
+        now = datetime.now().isoformat()
+        event_store.record(
+            'status' if command == 'status' else 'command',
+            display=self.key,
+            command=command,
+            args=list(args),
+            success=error is None,
+            latency_ms=round(latency * 1000) if latency is not None else None,
+            error=str(error) if error is not None else None,
+            result=result.to_dict() if command == 'status' and error is None else None
+        )
+
+        if command == 'status':
+            self._status_checked_at = time.monotonic()
+
+        if error is not None:
+            self.status['error_count'] += 1
+            if command == 'status':
+                logger.error(f"[{self.key}] Errore verifica stato: {error}")
+                # Le letture precedenti non descrivono più il display
+                self.status.update(power='error', volume=None, mute=None, temperature=None,
+                                   errors=[], last_check=now)
+                self.snapshot = None
+                timeseries_store.record(self.key, 'error')
+            elif command == 'power_on':
+                logger.error(f"[{self.key}] Errore accensione display: {error}")
+            elif command == 'power_off':
+                logger.error(f"[{self.key}] Errore spegnimento display: {error}")
+            elif command == 'source':
+                logger.error(f"[{self.key}] Errore cambio sorgente: {error}")
+            return False
+
+        if command == 'power_on':
+            self.status['power'] = 'on'
+            self.status['last_command'] = 'power_on'
+            logger.info(f"[{self.key}] Display acceso (via samsung-mdc)")
+        elif command == 'power_off':
+            self.status['power'] = 'off'
+            self.status['last_command'] = 'power_off'
+            logger.info(f"[{self.key}] Display spento (via samsung-mdc)")
+        elif command == 'source':
+            self.status['source'] = args[0]
+            self.status['last_command'] = f'set_source_{args[0]}'
+            logger.info(f"[{self.key}] Sorgente cambiata a {args[0]} (via samsung-mdc)")
+        elif command == 'status':
+            self.snapshot = result
+            self.status.update(result.to_dict())
+        self.status['last_check'] = now
+
+        if command == 'status':
+            timeseries_store.record(
+                self.key, self.status['power'],
+                round(latency * 1000, 1) if latency is not None else None
+            )
+        return True
+
+    def interrupt_watchdog(self, command):
+        """Un comando manuale interrompe l'eventuale recovery in corso"""
+        if command != 'status' and self.watchdog is not None:
+            self.watchdog.interrupt()
+
+    def _run(self, command, *args):
+        self.interrupt_watchdog(command)
+        try:
+            return run_async(self.commands.run(command, *args)).success
+        except Exception as e:
+            # Il comando è rimasto in coda oltre il timeout
+            logger.error(f"[{self.key}] Comando {command} non eseguito: {e}")
+            return False
+
+    def power_on(self):
+        success = self._run("power_on")
+        if success:
+            broadcast_status_update()
+        return success
+    
+    def power_off(self):
+        success = self._run("power_off")
+        if success:
+            broadcast_status_update()
+        return success
+
+    def set_source(self, source):
+        success = self._run("source", source)
+        if success:
+            broadcast_status_update()
+        return success
+
+    def check_status(self):
+        success = self._run("status")
+        broadcast_status_update()
+        return success
+
+    def get_snapshot(self, max_age=None):
+        """DisplaySnapshot aggiornato (dalla cache se recente), None se il display non risponde"""
+        self.get_status(max_age)
+        if self.status['power'] == 'error':
+            return None
+        return self.snapshot
+
+    def status_age(self):
+        """Secondi dall'ultima query di stato (None se mai eseguita)"""
+        if self._status_checked_at is None:
+            return None
+        return time.monotonic() - self._status_checked_at
+
+    def refresh_status(self):
+        """Query di stato single-flight: i chiamanti concorrenti condividono la stessa query"""
+        with self._status_lock:
+            inflight = self._status_inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._status_inflight = concurrent.futures.Future()
+
+        if not leader:
+            return inflight.result()
+
+        try:
+            success = self.check_status()
+            inflight.set_result(success)
+            return success
+        except BaseException as e:
+            inflight.set_exception(e)
+            raise
+        finally:
+            with self._status_lock:
+                self._status_inflight = None
+
+    def get_status(self, max_age=None, stale_while_revalidate=None):
+        """
+        Stato del display dalla cache se più recente di max_age secondi,
+        altrimenti aggiornato con refresh_status(). Con stale_while_revalidate
+        uno stato scaduto viene restituito subito e aggiornato in background.
+        """
+        cache_config = CONFIG.get('status_cache', DEFAULT_CONFIG['status_cache'])
+        if max_age is None:
+            max_age = cache_config.get('ttl', 10)
+        if stale_while_revalidate is None:
+            stale_while_revalidate = cache_config.get('stale_while_revalidate', False)
+
+        age = self.status_age()
+        if age is not None and age <= max_age:
+            return self.status
+
+        if age is not None and stale_while_revalidate:
+            if self._status_inflight is None:
+                threading.Thread(target=self.refresh_status, daemon=True).start()
+            return self.status
+
+        self.refresh_status()
+        return self.status
+
+# =====================================================================
+# FLEET CONTROLLER
+# =====================================================================
+
+class FleetController:
+    """
+    Registro dei display e gruppi, con invio concorrente dei comandi.
+
+    I comandi verso più display partono in parallelo sul loop condiviso,
+    limitati da max_concurrency: la durata totale è quella del display
+    più lento, non la somma.
+    """
+
+    def __init__(self, max_concurrency=10):
+        self.max_concurrency = max(1, max_concurrency)
+        self.controllers = {}
+        self.groups = {}
+
+    @classmethod
+    def from_config(cls, config):
+        fleet_config = config.get('fleet', {})
+        fleet = cls(fleet_config.get('max_concurrency', 10))
+
+        # Il display principale resta quello della sezione "display"
+        primary = config['display']
+        fleet.add(DisplayController(
+            primary['ip'],
+            key=primary.get('id', 'main'),
+            name=primary.get('name'),
+            display_id=primary.get('display_id', 0)
+        ))
+        for item in fleet_config.get('displays', []):
+            if item['id'] in fleet.controllers:
+                continue
+            fleet.add(DisplayController(
+                item['ip'],
+                key=item['id'],
+                name=item.get('name'),
+                display_id=item.get('display_id', 0)
+            ))
+
+        for group, members in fleet_config.get('groups', {}).items():
+            fleet.groups[group] = [m for m in members if m in fleet.controllers]
+        return fleet
+
+    @property
+    def primary(self):
+        return next(iter(self.controllers.values()))
+
+    def add(self, controller):
+        self.controllers[controller.key] = controller
+
+    def resolve(self, target):
+        """Risolve 'all', un gruppo, un display o una lista di display nei relativi controller"""
+        if isinstance(target, (list, tuple)):
+            return [self.controllers[key] for key in target]
+        if target == 'all':
+            return list(self.controllers.values())
+        if target in self.groups:
+            return [self.controllers[key] for key in self.groups[target]]
+        if target in self.controllers:
+            return [self.controllers[target]]
+        raise KeyError(target)
+
+    async def _fan_out(self, controllers, command, args):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(controller):
+            async with semaphore:
+                return controller, await controller.commands.run(command, *args)
+
+        return await asyncio.gather(*(run_one(c) for c in controllers))
+
+    def execute(self, target, command, *args):
+        """Esegue il comando su tutti i display del target, restituisce gli esiti per display"""
+        controllers = self.resolve(target)
+        for controller in controllers:
+            controller.interrupt_watchdog(command)
+        timeout = MDC_CONFIG.get('command_timeout', 30)
+        waves = -(-len(controllers) // self.max_concurrency)
+
+        outcomes = run_async(
+            self._fan_out(controllers, command, args),
+            timeout=timeout * waves + 5
+        )
+
+        results = {}
+        for controller, outcome in outcomes:
+            results[controller.key] = {
+                'success': outcome.success,
+                'name': controller.name,
+                'latency_ms': round(outcome.latency * 1000),
+                'error': str(outcome.error) if outcome.error is not None else None,
+                'status': dict(controller.status)
+            }
+
+        broadcast_status_update()
+        return results
+
+    def power_on(self, target='all'):
+        return self.execute(target, 'power_on')
+
+    def power_off(self, target='all'):
+        return self.execute(target, 'power_off')
+
+    def set_source(self, target, source):
+        return self.execute(target, 'source', source)
+
+    def check_status(self, target='all'):
+        return self.execute(target, 'status')
+
+    def describe(self):
+        return {
+            'displays': {
+                key: {
+                    'name': c.name,
+                    'ip': c.ip,
+                    'display_id': c.display_id,
+                    'status': c.status,
+                    'watchdog': c.watchdog.state if c.watchdog else None
+                }
+                for key, c in self.controllers.items()
+            },
+            'groups': self.groups
+        }
+
+# Istanze globali: flotta e controller del display principale
+fleet = FleetController.from_config(CONFIG)
+display_controller = fleet.primary
+
+# =====================================================================
+# SCHEDULER
+# =====================================================================
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+def _parse_hhmm(value):
+    """'HH:MM' → secondi dalla mezzanotte (ammesso '24:00')"""
+    hours, minutes = value.split(':')
+    seconds = int(hours) * 3600 + int(minutes) * 60
+    if not 0 <= seconds <= DAY_SECONDS or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Orario non valido: {value}")
+    return seconds
+
+class WeeklySchedule:
+    """
+    Schedule compilato: intervalli settimanali ordinati (secondi da lunedì
+    00:00) con ricerca binaria. Supporta più finestre al giorno, finestre
+    notturne (18:00-02:00) e giorni festivi in cui il display resta spento.
+    """
+
+    # Limite di sicurezza per next_transition (festivi consecutivi)
+    MAX_LOOKAHEAD = 800
+
+    def __init__(self, config=None):
+        self._state = ((), (), (), frozenset(), frozenset())
+        self.transitions = []
+        if config is not None:
+            self.configure(config)
+
+    def configure(self, config):
+        """Compila la sezione schedule della configurazione"""
+        windows = []
+        if config.get('enabled'):
+            specs = config.get('windows') or [{
+                'days': config.get('days', []),
+                'power_on': config['power_on'],
+                'power_off': config['power_off']
+            }]
+            for spec in specs:
+                on = _parse_hhmm(spec['power_on'])
+                off = _parse_hhmm(spec['power_off'])
+                if on == off:
+                    logger.warning(f"Finestra schedule vuota ignorata: {spec}")
+                    continue
+                for day in spec.get('days', config.get('days', [])):
+                    if day not in WEEKDAYS:
+                        logger.warning(f"Giorno schedule sconosciuto: {day}")
+                        continue
+                    start = WEEKDAYS.index(day) * DAY_SECONDS + on
+                    # Finestra notturna: termina il giorno successivo
+                    end = start - on + off + (DAY_SECONDS if off < on else 0)
+                    windows.append((start, end))
+
+        # Le finestre che superano domenica 24:00 ripartono da lunedì
+        intervals = []
+        for start, end in windows:
+            if end > WEEK_SECONDS:
+                intervals.append((0, end - WEEK_SECONDS))
+                end = WEEK_SECONDS
+            intervals.append((start, end))
+
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        transitions = [(start, 'on') for start in starts] + [(end, 'off') for end in ends]
+        if len(starts) > 1 and starts[0] == 0 and ends[-1] == WEEK_SECONDS:
+            # Finestra a cavallo tra domenica e lunedì: nessun cambio a mezzanotte
+            transitions.remove((0, 'on'))
+            transitions.remove((WEEK_SECONDS, 'off'))
+        transitions = sorted((offset % WEEK_SECONDS, action) for offset, action in transitions)
+        if len(starts) == 1 and starts[0] == 0 and ends[0] == WEEK_SECONDS:
+            transitions = []
+        edges = [offset for offset, _ in transitions]
+
+        holidays, recurring = set(), set()
+        for value in config.get('holidays', []):
+            try:
+                if len(value) == 5:
+                    recurring.add(tuple(int(x) for x in value.split('-')))
+                else:
+                    holidays.add(datetime.strptime(value, '%Y-%m-%d').date())
+            except ValueError:
+                logger.warning(f"Festività non valida: {value}")
+
+        # Sostituzione atomica: i lettori vedono sempre uno stato coerente
+        self._state = (tuple(starts), tuple(ends), tuple(edges), frozenset(holidays), frozenset(recurring))
+        self.transitions = transitions
+
+    def is_holiday(self, day):
+        _, _, _, holidays, recurring = self._state
+        return day in holidays or (day.month, day.day) in recurring
+
+    @staticmethod
+    def _week_offset(moment):
+        return (moment.weekday() * DAY_SECONDS + moment.hour * 3600 + moment.minute * 60
+                + moment.second + moment.microsecond / 1e6)
+
+    def contains(self, moment):
+        """True se il display deve essere acceso in questo istante"""
+        starts, ends, _, _, _ = self._state
+        if not starts or self.is_holiday(moment.date()):
+            return False
+        offset = self._week_offset(moment)
+        i = bisect.bisect_right(starts, offset) - 1
+        if i < 0 or offset >= ends[i]:
+            return False
+        # La coda notturna di una finestra iniziata in un festivo resta spenta
+        start = starts[i]
+        if i == 0 and start == 0 and ends[-1] == WEEK_SECONDS:
+            start = starts[-1] - WEEK_SECONDS
+        today = offset - offset % DAY_SECONDS
+        if today - DAY_SECONDS <= start < today:
+            return not self.is_holiday(moment.date() - timedelta(days=1))
+        return True
+
+    def _next_boundary(self, moment):
+        _, _, edges, holidays, recurring = self._state
+        boundary = None
+        if edges:
+            offset = self._week_offset(moment)
+            i = bisect.bisect_right(edges, offset)
+            delta = edges[i] - offset if i < len(edges) else WEEK_SECONDS - offset + edges[0]
+            boundary = moment + timedelta(seconds=delta)
+        if holidays or recurring:
+            # Anche la mezzanotte attorno a un festivo è un possibile cambio di stato
+            midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            if boundary is None or self.is_holiday(moment.date()) or self.is_holiday(midnight.date()):
+                boundary = midnight if boundary is None else min(boundary, midnight)
+        return boundary
+
+    def next_transition(self, moment=None):
+        """
+        Prossimo cambio di stato dopo `moment`: (datetime, 'on'|'off'),
+        None se lo stato non cambia mai.
+        """
+        moment = moment or datetime.now()
+        starts, _, edges, holidays, recurring = self._state
+        # Schedule vuoto, o sempre acceso senza festivi: lo stato non cambia mai
+        if not starts or not (edges or holidays or recurring):
+            return None
+        state = self.contains(moment)
+        for _ in range(self.MAX_LOOKAHEAD):
+            moment = self._next_boundary(moment)
+            if self.contains(moment) != state:
+                return moment, 'off' if state else 'on'
+        return None
+
+# Istanza globale schedule compilato (ricompilato a ogni modifica della configurazione)
+weekly_schedule = WeeklySchedule(CONFIG['schedule'])
+
+def is_in_schedule(now=None):
+    """Verifica se l'ora corrente è dentro lo schedule"""
+    return weekly_schedule.contains(now or datetime.now())
+
+def _failed_displays(results):
+    return [r['name'] for r in results.values() if not r['success']]
+
+def scheduled_power_on():
+    """Accensione schedulata"""
+    logger.info("Esecuzione accensione schedulata")
+    results = fleet.power_on('all')
+    powered = [key for key, r in results.items() if r['success']]
+    if powered:
+        time.sleep(3)
+        fleet.set_source(powered, CONFIG['schedule']['source_on_startup'])
+
+    failed = _failed_displays(results)
+    if not failed:
+        send_notification("✅ Display Acceso", "Accensione schedulata eseguita con successo")
+    else:
+        send_notification(
+            "⚠️ Accensione Schedulata Parziale",
+            f"Display non accesi: {', '.join(failed)}"
+        )
+
+def scheduled_power_off():
+    """Spegnimento schedulato"""
+    logger.info("Esecuzione spegnimento schedulato")
+    failed = _failed_displays(fleet.power_off('all'))
+    if not failed:
+        send_notification("✅ Display Spento", "Spegnimento schedulato eseguito con successo")
+    else:
+        send_notification(
+            "⚠️ Spegnimento Schedulato Parziale",
+            f"Display non spenti: {', '.join(failed)}"
+        )
+
+class Scheduler:
+    """
+    Scheduler a eventi: calcola la prossima transizione dallo schedule
+    compilato e attende esattamente fino a quel momento su una condition.
+    Dopo una sospensione o un salto d'orologio esegue una sola volta il job
+    dell'ultima transizione persa.
+    """
+
+    # Attesa massima: limita l'effetto di cambi dell'orologio di sistema
+    MAX_WAIT = 3600
+    # Numero massimo di transizioni perse esaminate al risveglio
+    MAX_CATCH_UP = 1000
+
+    def __init__(self, plan, jobs):
+        self.plan = plan
+        self.jobs = jobs
+        self._cond = threading.Condition()
+        self._generation = 0
+        self.checkpoint = datetime.now()
+        self.next_due = None
+
+    def wake(self):
+        """Ricalcola la prossima transizione (es. dopo una modifica della configurazione)"""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    def _missed(self, now):
+        """Transizioni comprese tra l'ultimo controllo (escluso) e now (incluso)"""
+        missed = []
+        moment = self.checkpoint
+        for _ in range(self.MAX_CATCH_UP):
+            transition = self.plan.next_transition(moment)
+            if transition is None or transition[0] > now:
+                break
+            missed.append(transition)
+            moment = transition[0]
+        return missed
+
+    def _run_due(self, now):
+        if now < self.checkpoint:
+            logger.warning("Orologio di sistema tornato indietro: nessun recupero dei job")
+            self.checkpoint = now
+            return
+        missed = self._missed(now)
+        self.checkpoint = now
+        if not missed:
+            return
+        due, action = missed[-1]
+        if len(missed) > 1 or (now - due).total_seconds() > 60:
+            logger.warning(
+                f"Scheduler: {len(missed)} transizioni perse, eseguo solo l'ultima "
+                f"({action} delle {due.strftime('%Y-%m-%d %H:%M')})"
+            )
+        try:
+            self.jobs[action]()
+        except Exception as e:
+            logger.error(f"Errore job schedulato {action}: {e}")
+
+    def run(self):
+        """Thread scheduler"""
+        generation = self._generation
+        while True:
+            self._run_due(datetime.now())
+
+            transition = self.plan.next_transition(self.checkpoint)
+            if transition and transition != self.next_due:
+                logger.info(f"Prossima transizione schedule: {transition[1]} alle {transition[0]}")
+            self.next_due = transition
+            timeout = self.MAX_WAIT
+            if transition:
+                timeout = min(timeout, max(0, (transition[0] - datetime.now()).total_seconds()))
+
+            with self._cond:
+                self._cond.wait_for(lambda: self._generation != generation, timeout)
+                if self._generation != generation:
+                    # Configurazione cambiata: nessun recupero retroattivo
+                    generation = self._generation
+                    self.checkpoint = datetime.now()
+
+# Istanza globale scheduler
+scheduler = Scheduler(weekly_schedule, {'on': scheduled_power_on, 'off': scheduled_power_off})
+
+# =====================================================================
+# WATCHDOG
+# =====================================================================
+
+class DisplayWatchdog:
+    """
+    Watchdog asincrono di un display, macchina a stati sul loop condiviso:
+
+        healthy → suspect → recovering → failed
+
+    Un errore porta in suspect; se la verifica di conferma fallisce parte il
+    power cycle (recovering), ripetuto fino a max_retry, poi failed con alert.
+    Le attese sono timer del loop: più display possono essere in recovery
+    contemporaneamente e un comando manuale interrompe il recovery in corso.
+    L'intervallo tra le verifiche si adatta allo stato: ravvicinato dopo un
+    errore, backoff esponenziale se irraggiungibile, più lungo fuori orario.
+    """
+
+    HEALTHY = 'healthy'
+    SUSPECT = 'suspect'
+    RECOVERING = 'recovering'
+    FAILED = 'failed'
+
+    # Attesa prima della verifica di conferma dopo un errore (secondi)
+    CONFIRM_DELAY = 15
+    # Verifiche ravvicinate (fast_interval) dopo un errore risolto
+    FAST_CHECKS = 3
+    # Power cycle: attesa, spegnimento, attesa, accensione, attesa, sorgente
+    POWER_CYCLE_DELAYS = (5, 10, 5)
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.key = controller.key
+        self.state = self.HEALTHY
+        self.retry_count = 0
+        self._fast_checks = 0
+        self._backoff_step = 0
+        self._task = None
+        self._recovery = None
+        self._manual_until = 0
+        self._wake = None
+
+    def start(self):
+        self._task = event_loop.submit(self._run())
+
+    def interrupt(self):
+        """Interrompe il recovery in corso (chiamabile da qualsiasi thread)"""
+        if self.state == self.RECOVERING:
+            event_loop.loop.call_soon_threadsafe(self._interrupt)
+
+    def wake(self):
+        """Anticipa la prossima verifica (chiamabile da qualsiasi thread)"""
+        if self._wake is not None:
+            event_loop.loop.call_soon_threadsafe(self._wake.set)
+
+    def _interrupt(self):
+        if self._recovery is not None and not self._recovery.done():
+            logger.info(f"[{self.key}] Recovery interrotto da comando manuale")
+            self._event('interrupted', retry=self.retry_count)
+            self._recovery.cancel()
+            # Il comando manuale prevale: niente riaccensione automatica per un
+            # intervallo di verifica, ma lo stato del display si ricontrolla subito
+            self._manual_until = time.monotonic() + self._setting('check_interval')
+            self._wake.set()
+
+    def _event(self, action, **fields):
+        WATCHDOG_ACTIONS.labels(action).inc()
+        event_store.record('watchdog', display=self.key, action=action, **fields)
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.info(f"[{self.key}] Watchdog: {self.state} → {state}")
+            self.state = state
+
+    @staticmethod
+    def _setting(key):
+        return CONFIG['watchdog'].get(key, DEFAULT_CONFIG['watchdog'][key])
+
+    def _jitter(self, delay):
+        """Sfasa le verifiche dei display per non concentrarle sullo stesso istante"""
+        spread = self._setting('jitter')
+        return delay * random.uniform(1 - spread, 1 + spread)
+
+    def _interval(self):
+        """Attesa per un display sano: ravvicinata dopo un errore, più lunga fuori orario"""
+        interval = self._setting('check_interval')
+        if self._fast_checks:
+            self._fast_checks -= 1
+            interval = min(interval, self._setting('fast_interval'))
+        elif CONFIG['schedule']['enabled'] and not is_in_schedule():
+            interval *= self._setting('off_hours_factor')
+        return self._jitter(interval)
+
+    def _backoff(self):
+        """Backoff esponenziale con jitter mentre il display resta irraggiungibile"""
+        delay = min(self._setting('max_backoff'), self._setting('fast_interval') * 2 ** self._backoff_step)
+        self._backoff_step = min(self._backoff_step + 1, 16)
+        return random.uniform(delay / 2, delay)
+
+    async def _sleep(self, delay):
+        try:
+            await asyncio.wait_for(self._wake.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        # Prima verifica sfasata tra i display della flotta
+        delay = random.uniform(0, self._setting('jitter') * self._setting('check_interval'))
+        while True:
+            await self._sleep(delay)
+            config = CONFIG['watchdog']
+            if not config['enabled']:
+                delay = config['check_interval']
+                continue
+            try:
+                delay = await self.check()
+            except Exception as e:
+                logger.error(f"[{self.key}] Errore watchdog: {e}")
+                delay = config['check_interval']
+
+    async def _command(self, command, *args):
+        """Comando del watchdog: passa dalla coda del display ma non interrompe sé stesso"""
+        outcome = await self.controller.commands.run(command, *args)
+        broadcast_status_update()
+        return outcome.success
+
+    async def _power_cycle(self):
+        first, second, third = self.POWER_CYCLE_DELAYS
+        await asyncio.sleep(first)
+        await self._command('power_off')
+        await asyncio.sleep(second)
+        await self._command('power_on')
+        await asyncio.sleep(third)
+        await self._command('source', CONFIG['schedule']['source_on_startup'])
+
+    async def _repower(self):
+        await self._command('power_on')
+        await asyncio.sleep(3)
+        await self._command('source', CONFIG['schedule']['source_on_startup'])
+
+    async def _recover(self, coro):
+        """Esegue un'azione di recovery interrompibile; False se interrotta"""
+        self._recovery = asyncio.ensure_future(coro)
+        await asyncio.wait([self._recovery])
+        interrupted = self._recovery.cancelled()
+        self._recovery = None
+        return not interrupted
+
+    async def check(self):
+        """Una verifica: aggiorna la macchina a stati e restituisce l'attesa successiva"""
+        config = CONFIG['watchdog']
+        max_retry = config['max_retry']
+        logger.info(f"[{self.key}] Watchdog check...")
+
+        if await self._command('status'):
+            if self.state != self.HEALTHY:
+                logger.info(f"[{self.key}] Display di nuovo raggiungibile")
+                self._event('recovered', retry=self.retry_count)
+                if self.state == self.FAILED:
+                    send_notification(
+                        f"✅ Display Ripristinato ({self.controller.name})",
+                        "Il display risponde di nuovo."
+                    )
+                self.retry_count = 0
+                self._backoff_step = 0
+                self._fast_checks = self.FAST_CHECKS
+                self._set_state(self.HEALTHY)
+
+            manual = time.monotonic() < self._manual_until
+            if self.controller.status['power'] == 'off' and is_in_schedule() and not manual:
+                # Display spento quando dovrebbe essere acceso
+                logger.warning(f"[{self.key}] Display spento durante orario schedulato - riaccensione")
+                self._event('repower')
+                self._set_state(self.RECOVERING)
+                await self._recover(self._repower())
+                self._set_state(self.HEALTHY)
+            return self._interval()
+
+        if self.state == self.HEALTHY:
+            logger.warning(f"[{self.key}] Display non raggiungibile, verifica tra {self.CONFIRM_DELAY}s")
+            self._set_state(self.SUSPECT)
+            return self._jitter(self.CONFIRM_DELAY)
+
+        if self.state == self.FAILED:
+            return self._backoff()
+
+        self.retry_count += 1
+        self._event('unreachable', retry=self.retry_count)
+
+        if self.retry_count >= max_retry:
+            logger.critical(f"[{self.key}] Max retry ({max_retry}) raggiunto!")
+            self._event('alert', retry=self.retry_count)
+            self._set_state(self.FAILED)
+            send_notification(
+                f"⚠️ ALERT: Display Non Raggiungibile ({self.controller.name})",
+                f"Il display non risponde dopo {max_retry} tentativi. Intervento richiesto."
+            )
+            return self._backoff()
+
+        # Tentativo power cycle
+        logger.warning(f"[{self.key}] Tentativo recovery {self.retry_count}/{max_retry}")
+        self._event('power_cycle', retry=self.retry_count)
+        self._set_state(self.RECOVERING)
+        await self._recover(self._power_cycle())
+        self._set_state(self.SUSPECT)
+        return self._jitter(self.CONFIRM_DELAY)
+
+class WatchdogSupervisor:
+    """Un DisplayWatchdog per ogni display della flotta"""
+
+    def __init__(self, fleet):
+        self.watchdogs = {}
+        for key, controller in fleet.controllers.items():
+            controller.watchdog = self.watchdogs[key] = DisplayWatchdog(controller)
+
+    def start(self):
+        for watchdog in self.watchdogs.values():
+            watchdog.start()
+
+    def wake(self):
+        for watchdog in self.watchdogs.values():
+            watchdog.wake()
+
+    def states(self):
+        return {key: w.state for key, w in self.watchdogs.items()}
+
+# Istanza globale watchdog
+watchdog_supervisor = WatchdogSupervisor(fleet)
+
+metrics_registry.register(CallbackMetric(
+    'watchdog_state', 'Stato del watchdog per display (1 = stato corrente)', ['display', 'state'],
+    lambda: [
+        ((key, state), int(w.state == state))
+        for key, w in watchdog_supervisor.watchdogs.items()
+        for state in (DisplayWatchdog.HEALTHY, DisplayWatchdog.SUSPECT,
+                      DisplayWatchdog.RECOVERING, DisplayWatchdog.FAILED)
+    ]
+))
+
+# =====================================================================
+# NOTIFICHE
+# =====================================================================
+
+class NotificationChannel:
+    """
+    Canale di notifica con coda e worker dedicati: un canale lento (es. SMTP)
+    non blocca né gli altri canali né i thread scheduler/watchdog.
+    """
+
+    name = None
+
+    def __init__(self, attempts=3, backoff=2, idle_timeout=300, batch_window=5, max_batch=20):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.sent = 0
+        self.digests = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return CONFIG['notifications'][self.name]
+
+    def enabled(self):
+        return self.config.get('enabled', False)
+
+    def put(self, title, message):
+        self._queue.put((title, message))
+        self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f'notify-{self.name}', daemon=True)
+            self._thread.start()
+
+    def _collect(self, first):
+        """Raccoglie gli eventi arrivati entro batch_window dal primo"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def digest(batch):
+        title = f"📋 Riepilogo: {len(batch)} notifiche"
+        message = '\n\n'.join(f"• {t}\n{m}" for t, m in batch)
+        return title, message
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self.idle()
+                continue
+
+            batch = self._collect(first)
+            if len(batch) == 1:
+                title, message = first
+            else:
+                title, message = self.digest(batch)
+                self.digests += 1
+            if self._deliver(title, message):
+                self.sent += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _deliver(self, title, message):
+        started = time.monotonic()
+        for attempt in range(self.attempts):
+            try:
+                self.send(title, message)
+                NOTIFICATIONS.labels(self.name, 'success').inc()
+                NOTIFICATION_DURATION.labels(self.name).observe(time.monotonic() - started)
+                event_store.record(
+                    'notification', channel=self.name, title=title, success=True,
+                    attempts=attempt + 1, latency_ms=round((time.monotonic() - started) * 1000)
+                )
+                return True
+            except Exception as e:
+                if attempt == self.attempts - 1:
+                    logger.error(f"Errore invio {self.name}: {e}")
+                    NOTIFICATIONS.labels(self.name, 'error').inc()
+                    NOTIFICATION_DURATION.labels(self.name).observe(time.monotonic() - started)
+                    event_store.record(
+                        'notification', channel=self.name, title=title, success=False,
+                        attempts=attempt + 1, latency_ms=round((time.monotonic() - started) * 1000),
+                        error=str(e)
+                    )
+                    return False
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Invio {self.name} fallito ({e}), nuovo tentativo tra {delay}s")
+                time.sleep(delay)
+
+    def send(self, title, message):
+        raise NotImplementedError
+
+    def idle(self):
+        """Chiamato dopo idle_timeout senza notifiche"""
+
+
+class TelegramChannel(NotificationChannel):
+    name = 'telegram'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Sessione HTTP persistente (keep-alive verso api.telegram.org)
+        self.session = requests.Session()
+
+    def send(self, title, message):
+        url = f'https://api.telegram.org/bot{self.config["bot_token"]}/sendMessage'
+        data = {
+            'chat_id': self.config['chat_id'],
+            'text': f'<b>{title}</b>\n\n{message}',
+            'parse_mode': 'HTML'
+        }
+        response = self.session.post(url, data=data, timeout=10)
+        response.raise_for_status()
+        logger.info(f"Notifica Telegram inviata: {title}")
+
+
+class EmailChannel(NotificationChannel):
+    name = 'email'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._smtp = None
+        self._smtp_key = None
+
+    def _connection(self):
+        """Connessione SMTP riutilizzata, riaperta se caduta o se la config è cambiata"""
+        config = self.config
+        key = (config['smtp_server'], config['smtp_port'], config['username'])
+
+        if self._smtp is not None and self._smtp_key == key:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+        self.close()
+
+        server = smtplib.SMTP(config['smtp_server'], config['smtp_port'], timeout=30)
+        server.starttls()
+        server.login(config['username'], config['password'])
+        self._smtp, self._smtp_key = server, key
+        return server
+
+    def send(self, title, message):
+        msg = MIMEText(message)
+        msg['Subject'] = title
+        msg['From'] = self.config['username']
+        msg['To'] = self.config['to_email']
+
+        try:
+            self._connection().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.close()
+            raise
+        logger.info(f"Email inviata: {title}")
+
+    def close(self):
+        server, self._smtp = self._smtp, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def idle(self):
+        self.close()
+
+
+class NotificationDispatcher:
+    """
+    Smista le notifiche sulle code dei canali abilitati.
+
+    Le coppie titolo/messaggio identiche entro dedupe_window vengono
+    soppresse (e contate); il primo invio successivo riporta quante
+    ripetizioni sono state soppresse.
+    """
+
+    def __init__(self, channels, dedupe_window=300):
+        self.channels = channels
+        self.dedupe_window = dedupe_window
+        self.received = 0
+        self.suppressed = 0
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def _admit(self, title, message):
+        """Restituisce il messaggio da inviare, o None se duplicato"""
+        now = time.monotonic()
+        key = (title, message)
+        with self._lock:
+            self.received += 1
+            # Pulizia delle chiavi scadute (quelle con soppressioni restano più a lungo
+            # per poterle riportare al prossimo invio)
+            for k, v in list(self._recent.items()):
+                age = now - v['sent_at']
+                if age > self.dedupe_window and (not v['suppressed'] or age > 10 * self.dedupe_window):
+                    del self._recent[k]
+
+            entry = self._recent.get(key)
+            if entry is not None and now - entry['sent_at'] <= self.dedupe_window:
+                entry['suppressed'] += 1
+                self.suppressed += 1
+                return None
+
+            repeated = entry['suppressed'] if entry is not None else 0
+            self._recent[key] = {'sent_at': now, 'suppressed': 0}
+
+        if repeated:
+            message += f"\n\n(+{repeated} notifiche identiche soppresse)"
+        return message
+
+    def dispatch(self, title, message, force=False):
+        if not force:
+            message = self._admit(title, message)
+            if message is None:
+                logger.info(f"Notifica duplicata soppressa: {title}")
+                return False
+        for channel in self.channels:
+            if channel.enabled():
+                channel.put(title, message)
+        return True
+
+    def stats(self):
+        with self._lock:
+            pending = {
+                title: v['suppressed']
+                for (title, _), v in self._recent.items() if v['suppressed']
+            }
+        return {
+            'received': self.received,
+            'suppressed': self.suppressed,
+            'pending_suppressed': pending,
+            'channels': {
+                c.name: {
+                    'enabled': c.enabled(),
+                    'queued': c._queue.qsize(),
+                    'sent': c.sent,
+                    'digests': c.digests
+                }
+                for c in self.channels
+            }
+        }
+
+# Istanza globale dispatcher
+_retry_config = CONFIG['notifications'].get('retry', {})
+_aggregation_config = CONFIG['notifications'].get('aggregation', {})
+notification_dispatcher = NotificationDispatcher(
+    [
+        channel_class(
+            attempts=_retry_config.get('attempts', 3),
+            backoff=_retry_config.get('backoff', 2),
+            batch_window=_aggregation_config.get('batch_window', 5),
+            max_batch=_aggregation_config.get('max_batch', 20)
+        )
+        for channel_class in (TelegramChannel, EmailChannel)
+    ],
+    dedupe_window=_aggregation_config.get('dedupe_window', 300)
+)
+
+def send_notification(title, message, force=False):
+    """Invia notifiche configurate (non bloccante: accoda sui canali abilitati)"""
+    return notification_dispatcher.dispatch(title, message, force=force)
+
+# =====================================================================
+# SYSTEM MONITOR
+# =====================================================================
+
+class XiboProcessTracker:
+    """
+    Tiene traccia del processo Xibo per PID. Il processo memorizzato viene
+    verificato con is_running() (che confronta anche l'ora di creazione,
+    contro il riuso dei PID); la process table viene riscandita solo quando
+    il processo sparisce.
+    """
+
+    def __init__(self, path=None):
+        # Il path in config è Windows: backslash come separatore anche su altri OS
+        self.exe_name = path.replace('\\', '/').rsplit('/', 1)[-1].lower() if path else None
+        self._proc = None
+
+    def _matches(self, name):
+        name = (name or '').lower()
+        if self.exe_name:
+            return name == self.exe_name
+        return 'xibo' in name
+
+    def _alive(self):
+        return self._proc is not None and self._proc.is_running()
+
+    def _scan(self):
+        for proc in psutil.process_iter(['name']):
+            if self._matches(proc.info['name']):
+                self._proc = proc
+                # Primo cpu_percent(None) come riferimento
+                try:
+                    proc.cpu_percent(interval=None)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+                return proc
+        self._proc = None
+        return None
+
+    def process(self):
+        """Processo Xibo corrente (None se non in esecuzione)"""
+        if self._alive():
+            return self._proc
+        return self._scan()
+
+    def info(self):
+        proc = self.process()
+        if proc is None:
+            return {'running': False, 'pid': None, 'cpu': None, 'rss_mb': None}
+        try:
+            with proc.oneshot():
+                return {
+                    'running': True,
+                    'pid': proc.pid,
+                    'cpu': proc.cpu_percent(interval=None),
+                    'rss_mb': round(proc.memory_info().rss / (1024 * 1024), 1)
+                }
+        except psutil.NoSuchProcess:
+            self._proc = None
+            return {'running': False, 'pid': None, 'cpu': None, 'rss_mb': None}
+        except psutil.AccessDenied:
+            return {'running': True, 'pid': proc.pid, 'cpu': None, 'rss_mb': None}
+
+# Istanza globale tracker Xibo
+xibo_tracker = XiboProcessTracker(CONFIG.get('xibo', {}).get('path'))
+
+class SystemMetricsSampler:
+    """
+    Thread che campiona CPU, memoria, disco, uptime e stato Xibo a intervallo
+    fisso. I lettori ricevono l'ultimo snapshot senza attendere psutil.
+    """
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self._snapshot = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Il primo cpu_percent(None) fa da riferimento per i successivi
+        psutil.cpu_percent(interval=None)
+
+    def sample(self):
+        try:
+            cpu = psutil.cpu_percent(interval=None)
+            mem = psutil.virtual_memory()
+            disk = psutil.disk_usage('C:\\')
+            
+            # Uptime
+            boot_time = psutil.boot_time()
+            uptime_seconds = time.time() - boot_time
+            uptime_str = str(timedelta(seconds=int(uptime_seconds)))
+            
+            # Processo Xibo (PID in cache)
+            xibo = xibo_tracker.info()
+            
+            # Sostituzione atomica del riferimento: nessun lock per i lettori
+            self._snapshot = {
+                'cpu': cpu,
+                'memory': mem.percent,
+                'disk': disk.percent,
+                'uptime': uptime_str,
+                'xibo_running': xibo['running'],
+                'xibo': xibo
+            }
+        except Exception as e:
+            logger.error(f"Errore lettura info sistema: {e}")
+        return self._snapshot
+
+    def snapshot(self):
+        """Ultimo snapshot disponibile (campionato subito se non ancora presente)"""
+        if self._snapshot is None:
+            return self.sample()
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+# Istanza globale sampler
+system_sampler = SystemMetricsSampler(
+    CONFIG.get('monitor', DEFAULT_CONFIG['monitor']).get('sample_interval', 5)
+)
+
+def get_system_info():
+    """Informazioni sistema (ultimo snapshot del sampler)"""
+    return system_sampler.snapshot()
+
+# =====================================================================
+# WEBSOCKET BROADCAST
+# =====================================================================
+
+def build_status_payload():
+    """Payload completo di stato per dashboard e API"""
+    return {
+        'display': display_controller.status,
+        'system': get_system_info(),
+        'schedule': {
+            'enabled': CONFIG['schedule']['enabled'],
+            'in_schedule': is_in_schedule()
+        }
+    }
+
+def diff_status(old, new, path=()):
+    """Differenze tra due snapshot: (changes [[path, valore]], removed [path])"""
+    changes, removed = [], []
+    for key, value in new.items():
+        key_path = path + (key,)
+        if key not in old:
+            changes.append([list(key_path), value])
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub_changes, sub_removed = diff_status(old[key], value, key_path)
+            changes.extend(sub_changes)
+            removed.extend(sub_removed)
+        elif old[key] != value:
+            changes.append([list(key_path), value])
+    for key in old:
+        if key not in new:
+            removed.append(list(path + (key,)))
+    return changes, removed
+
+class StatusBroadcaster:
+    """
+    Coda di broadcast con coalescing: le richieste arrivate entro la
+    finestra producono un solo aggiornamento, emesso da un thread dedicato
+    così i comandi MDC non attendono mai Socket.IO.
+
+    Gli snapshot sono versionati: dopo lo snapshot completo (status_update)
+    i client ricevono solo i campi cambiati (status_patch). Un client rimasto
+    indietro chiede status_resync con l'ultimo seq applicato.
+    """
+
+    def __init__(self, window=0.5, history=50):
+        self.window = window
+        self.requested = 0
+        self.sent = 0
+        self.seq = 0
+        self._snapshot = None
+        self._history = deque(maxlen=history)
+        self._pending = False
+        self._cond = threading.Condition()
+        self._state_lock = threading.Lock()
+        self._thread = None
+
+    def request(self):
+        """Richiede un broadcast (non bloccante)"""
+        with self._cond:
+            self._pending = True
+            self.requested += 1
+            self._cond.notify()
+        self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='status-broadcaster', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+            # Finestra di coalescing: raccoglie le richieste successive
+            time.sleep(self.window)
+            with self._cond:
+                self._pending = False
+
+            self._emit()
+
+    @staticmethod
+    def _capture():
+        # Copia profonda e serializzabile (display.status viene modificato in place)
+        return json.loads(json.dumps(build_status_payload(), default=str))
+
+    def _full(self):
+        return dict(self._snapshot, seq=self.seq)
+
+    def current(self):
+        """Snapshot completo corrente con il relativo seq"""
+        with self._state_lock:
+            if self._snapshot is None:
+                self._snapshot = self._capture()
+                self.seq += 1
+                self._history.clear()
+            return self._full()
+
+    def since(self, seq):
+        """Patch successive a seq, oppure None se non più disponibili"""
+        with self._state_lock:
+            if seq == self.seq:
+                return []
+            patches = [p for p in self._history if p['seq'] > seq]
+            if not patches or patches[0]['base'] != seq:
+                return None
+            return patches
+
+    def _emit(self):
+        try:
+            payload = self._capture()
+            with self._state_lock:
+                previous = self._snapshot
+                if previous is None:
+                    self.seq += 1
+                    self._snapshot = payload
+                    self._history.clear()
+                    event, data = 'status_update', self._full()
+                else:
+                    changes, removed = diff_status(previous, payload)
+                    if not changes and not removed:
+                        return
+                    self.seq += 1
+                    self._snapshot = payload
+                    data = {
+                        'seq': self.seq,
+                        'base': self.seq - 1,
+                        'changes': changes,
+                        'removed': removed
+                    }
+                    self._history.append(data)
+                    event = 'status_patch'
+
+            socketio.emit(event, data, to=STATUS_ROOM)
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Errore broadcast stato: {e}")
+
+# Istanza globale broadcaster
+BROADCAST_CONFIG = CONFIG.get('broadcast', DEFAULT_CONFIG['broadcast'])
+status_broadcaster = StatusBroadcaster(
+    BROADCAST_CONFIG.get('coalesce_window', 0.5),
+    BROADCAST_CONFIG.get('history', 50)
+)
+
+def broadcast_status_update():
+    """Accoda un aggiornamento stato per tutti i client connessi"""
+    status_broadcaster.request()
 
 # =====================================================================
-# FLASK APP
+# STATUS WATCHER
 # =====================================================================
 
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(32)
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
-socketio = SocketIO(app, cors_allowed_origins="*")
+STATUS_ROOM = 'status'
 
-# =====================================================================
-# DISPLAY CONTROLLER
-# =====================================================================
+class StatusWatcher:
+    """
+    Interroga i display una sola volta per intervallo, indipendentemente dal
+    numero di dashboard aperte, e pubblica le variazioni nella room 'status'.
+    Senza client connessi il polling è sospeso (resta attivo il watchdog).
+    """
 
-class DisplayController:
-    def __init__(self, ip):
-        self.ip = ip
-        self.status = {
-            'power': 'unknown',
-            'source': 'unknown',
-            'last_check': None,
-            'last_command': None,
-            'error_count': 0
-        }
-        self.retry_count = 0
-        self.max_retry = CONFIG['watchdog']['max_retry']
-        
-    def connect(self, retries=3):
-        """Connessione al display con retry"""
-        for i in range(retries):
+    def __init__(self, interval=30):
+        self.interval = interval
+        self.viewers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_viewer(self, sid):
+        with self._lock:
+            self.viewers.add(sid)
+
+    def remove_viewer(self, sid):
+        with self._lock:
+            self.viewers.discard(sid)
+
+    def poll(self):
+        # I display già interrogati di recente (API, watchdog) restano in cache
+        stale = [
+            key for key, c in fleet.controllers.items()
+            if c.status_age() is None or c.status_age() >= self.interval
+        ]
+        if stale:
+            fleet.execute(stale, 'status')
+        else:
+            broadcast_status_update()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.viewers:
+                continue
             try:
-                display = MDC(self.ip, verbose=False)
-                return display
+                self.poll()
             except Exception as e:
-                logger.warning(f"Tentativo connessione {i+1}/{retries} fallito: {e}")
-                if i < retries - 1:
-                    time.sleep(2)
-        return None
-    
-    def power_on(self):
-        try:
-            #asyncio.run(mdc_command(self.ip, 0, "power_on"))
-            run_async(mdc_command(self.ip, 0, "power_on"))
-            self.status['power'] = 'on'
-            self.status['last_command'] = 'power_on'
-            self.status['last_check'] = datetime.now().isoformat()
-            logger.info("Display acceso (via samsung-mdc)")
-            broadcast_status_update()
-            return True
-        except Exception as e:
-            logger.error(f"Errore accensione display: {e}")
-            self.status['error_count'] += 1
-            return False
-    
-    def power_off(self):
-        try:
-            #asyncio.run(mdc_command(self.ip, 0, "power_off"))
-            run_async(mdc_command(self.ip, 0, "power_off"))
-            self.status['power'] = 'off'
-            self.status['last_command'] = 'power_off'
-            self.status['last_check'] = datetime.now().isoformat()
-            logger.info("Display spento (via samsung-mdc)")
-            broadcast_status_update()
-            return True
-        except Exception as e:
-            logger.error(f"Errore spegnimento display: {e}")
-            self.status['error_count'] += 1
-            return False
+                logger.error(f"Errore status watcher: {e}")
 
-    
-    def set_source(self, source):
-        try:
-            #asyncio.run(mdc_command(self.ip, 0, "source", source))
-            run_async(mdc_command(self.ip, 0, "source", source))
-            self.status['source'] = source
-            self.status['last_command'] = f'set_source_{source}'
-            self.status['last_check'] = datetime.now().isoformat()
-            logger.info(f"Sorgente cambiata a {source} (via samsung-mdc)")
-            broadcast_status_update()
-            return True
-        except Exception as e:
-            logger.error(f"Errore cambio sorgente: {e}")
-            self.status['error_count'] += 1
-            return False
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='status-watcher', daemon=True)
+        self._thread.start()
 
-    
-    def check_status(self):
-        try:
-            #result = asyncio.run(mdc_command(self.ip, 0, "status"))
-            result = run_async(mdc_command(self.ip, 0, "status"))
-            self.status['power'] = str(result)
-            self.status['last_check'] = datetime.now().isoformat()
-            broadcast_status_update()
-            return True
-        except Exception as e:
-            logger.error(f"Errore verifica stato: {e}")
-            self.status['power'] = 'error'
-            self.status['last_check'] = datetime.now().isoformat()
-            self.status['error_count'] += 1
-            broadcast_status_update()
-            return Fals
+    def stop(self):
+        self._stop.set()
 
-    
-    def watchdog(self):
-        """Verifica e recovery automatico"""
-        logger.info("Watchdog check...")
-        
-        if not self.check_status():
-            logger.warning("Display non raggiungibile")
-            self.retry_count += 1
-            
-            if self.retry_count >= self.max_retry:
-                logger.critical(f"Max retry ({self.max_retry}) raggiunto!")
-                send_notification(
-                    "⚠️ ALERT: Display Non Raggiungibile",
-                    f"Il display non risponde dopo {self.max_retry} tentativi. Intervento richiesto."
-                )
-                self.retry_count = 0
-                return False
-            
-            # Tentativo power cycle
-            logger.warning(f"Tentativo recovery {self.retry_count}/{self.max_retry}")
-            time.sleep(5)
-            self.power_off()
-            time.sleep(10)
-            self.power_on()
-            time.sleep(5)
-            self.set_source(CONFIG['schedule']['source_on_startup'])
-            
-        elif self.status['power'] == 'off':
-            # Display spento quando dovrebbe essere acceso
-            if is_in_schedule():
-                logger.warning("Display spento durante orario schedulato - riaccensione")
-                self.power_on()
-                time.sleep(3)
-                self.set_source(CONFIG['schedule']['source_on_startup'])
-        
-        return True
+# Istanza globale watcher
+status_watcher = StatusWatcher(
+    CONFIG.get('status_watcher', DEFAULT_CONFIG['status_watcher']).get('interval', 30)
+)
 
-# Istanza globale controller
-display_controller = DisplayController(CONFIG['display']['ip'])
+metrics_registry.register(CallbackMetric(
+    'display_error_count', 'Errori accumulati per display', ['display'],
+    lambda: [((key,), c.status['error_count']) for key, c in fleet.controllers.items()]
+))
+metrics_registry.register(CallbackMetric(
+    'display_command_queue_depth', 'Comandi in attesa nella coda del display', ['display'],
+    lambda: [((key,), len(c.commands)) for key, c in fleet.controllers.items()]
+))
+metrics_registry.register(CallbackMetric(
+    'socketio_clients', 'Dashboard connesse via Socket.IO', [],
+    lambda: [((), len(status_watcher.viewers))]
+))
+metrics_registry.register(CallbackMetric(
+    'status_broadcasts', 'Broadcast di stato emessi', [],
+    lambda: [((), status_broadcaster.sent)], type='counter'
+))
 
 # =====================================================================
-# SCHEDULER
+# LOG TAIL
 # =====================================================================
 
-def is_in_schedule():
-    """Verifica se l'ora corrente è dentro lo schedule"""
-    if not CONFIG['schedule']['enabled']:
-        return False
-    
-    now = datetime.now()
-    day_name = now.strftime('%A').lower()
-    
-    if day_name not in CONFIG['schedule']['days']:
-        return False
-    
-    current_time = now.time()
-    on_time = datetime.strptime(CONFIG['schedule']['power_on'], '%H:%M').time()
-    off_time = datetime.strptime(CONFIG['schedule']['power_off'], '%H:%M').time()
-    
-    return on_time <= current_time <= off_time
+TAIL_BLOCK_SIZE = 8192
 
-def scheduled_power_on():
-    """Accensione schedulata"""
-    logger.info("Esecuzione accensione schedulata")
-    if display_controller.power_on():
-        time.sleep(3)
-        display_controller.set_source(CONFIG['schedule']['source_on_startup'])
-        send_notification("✅ Display Acceso", "Accensione schedulata eseguita con successo")
+def _read_tail(f, start, end, lines):
+    """Ultime `lines` righe complete nel range [start, end), lette a blocchi da fine file"""
+    chunks = []
+    newlines = 0
+    pos = end
+    while pos > start and newlines <= lines:
+        size = min(TAIL_BLOCK_SIZE, pos - start)
+        pos -= size
+        f.seek(pos)
+        chunk = f.read(size)
+        chunks.append(chunk)
+        newlines += chunk.count(b'\n')
 
-def scheduled_power_off():
-    """Spegnimento schedulato"""
-    logger.info("Esecuzione spegnimento schedulato")
-    if display_controller.power_off():
-        send_notification("✅ Display Spento", "Spegnimento schedulato eseguito con successo")
+    data = b''.join(reversed(chunks))
+    result = data.decode('utf-8', errors='replace').splitlines()
+    # Se non siamo arrivati a start la prima riga è parziale
+    if pos > start:
+        result = result[1:]
+    return result[-lines:]
 
-def setup_scheduler():
-    """Configura scheduler"""
-    if not CONFIG['schedule']['enabled']:
-        logger.info("Scheduler disabilitato")
-        return
-    
-    schedule.clear()
-    
-    days_map = {
-        'monday': schedule.every().monday,
-        'tuesday': schedule.every().tuesday,
-        'wednesday': schedule.every().wednesday,
-        'thursday': schedule.every().thursday,
-        'friday': schedule.every().friday,
-        'saturday': schedule.every().saturday,
-        'sunday': schedule.every().sunday
-    }
-    
-    for day in CONFIG['schedule']['days']:
-        if day in days_map:
-            days_map[day].at(CONFIG['schedule']['power_on']).do(scheduled_power_on)
-            days_map[day].at(CONFIG['schedule']['power_off']).do(scheduled_power_off)
-    
-    logger.info(f"Scheduler configurato: ON={CONFIG['schedule']['power_on']}, OFF={CONFIG['schedule']['power_off']}")
+def _read_forward(f, start, end, lines):
+    """Prime `lines` righe complete da start e offset di fine dell'ultima restituita"""
+    result = []
+    cursor = start
+    pending = b''
+    f.seek(start)
+    pos = start
+    while pos < end and len(result) < lines:
+        chunk = f.read(min(TAIL_BLOCK_SIZE, end - pos))
+        if not chunk:
+            break
+        pos += len(chunk)
+        *complete, pending = (pending + chunk).split(b'\n')
+        for line in complete:
+            result.append(line.decode('utf-8', errors='replace').rstrip('\r'))
+            cursor += len(line) + 1
+            if len(result) == lines:
+                break
+    return result, cursor
 
-def run_scheduler():
-    """Thread scheduler"""
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+def _tail_file(f, lines, since=None):
+    """Come tail_log su un file aperto, con il cursore come semplice offset in byte"""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
 
-# =====================================================================
-# WATCHDOG
-# =====================================================================
+    # Escludi l'eventuale riga ancora in scrittura (senza newline finale)
+    end = size
+    while end > 0:
+        pos = max(0, end - TAIL_BLOCK_SIZE)
+        f.seek(pos)
+        last_newline = f.read(end - pos).rfind(b'\n')
+        if last_newline != -1:
+            end = pos + last_newline + 1
+            break
+        end = pos
 
-def run_watchdog():
-    """Thread watchdog"""
-    while True:
-        if CONFIG['watchdog']['enabled']:
-            display_controller.watchdog()
-        time.sleep(CONFIG['watchdog']['check_interval'])
+    if since is not None:
+        # Cursore oltre la fine: file troncato, ripartire da zero
+        return _read_forward(f, since if 0 <= since <= end else 0, end, lines)
 
-# =====================================================================
-# NOTIFICHE
-# =====================================================================
+    return _read_tail(f, 0, end, lines), end
 
-def send_notification(title, message):
-    """Invia notifiche configurate"""
-    
-    # Telegram
-    if CONFIG['notifications']['telegram']['enabled']:
-        try:
-            import requests
-            bot_token = CONFIG['notifications']['telegram']['bot_token']
-            chat_id = CONFIG['notifications']['telegram']['chat_id']
-            
-            url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-            data = {
-                'chat_id': chat_id,
-                'text': f'<b>{title}</b>\n\n{message}',
-                'parse_mode': 'HTML'
-            }
-            requests.post(url, data=data, timeout=10)
-            logger.info(f"Notifica Telegram inviata: {title}")
-        except Exception as e:
-            logger.error(f"Errore invio Telegram: {e}")
-    
-    # Email
-    if CONFIG['notifications']['email']['enabled']:
+def _log_file_id(f):
+    """
+    Identità del file di log: inode e prima riga completa. Dopo una rotazione
+    il nome resta lo stesso ma il file è un altro (e l'inode può essere riusato).
+    """
+    f.seek(0)
+    first = f.readline(256)
+    if not first.endswith(b'\n'):
+        first = b''
+    return '%x%08x' % (os.fstat(f.fileno()).st_ino, zlib.crc32(first))
+
+def tail_log(path, lines=100, since=None):
+    """
+    Ultime `lines` righe del log e cursore ('<file>:<offset>') per letture
+    incrementali. Con `since` restituisce le righe scritte dopo il cursore,
+    al massimo `lines`, e il cursore alla fine dell'ultima riga restituita:
+    se le nuove righe sono di più basta ripetere la lettura. Un cursore di un
+    altro file (log ruotato) o non valido fa ripartire dall'inizio del file.
+    Il costo dipende da `lines`, non dalla dimensione del file.
+    """
+    with open(path, 'rb') as f:
+        file_id = _log_file_id(f)
+        offset = None
+        if since is not None:
+            cursor_id, _, cursor_offset = str(since).rpartition(':')
+            offset = int(cursor_offset) if cursor_id == file_id and cursor_offset.isdigit() else 0
+        result, end = _tail_file(f, lines, offset)
+        return result, f'{file_id}:{end}'
+
+def read_log_range(start=None, end=None, lines=100):
+    """
+    Righe di log con timestamp in [start, end] ('YYYY-MM-DD HH:MM:SS').
+    Grazie all'indice vengono aperti solo i segmenti che coprono il range.
+    """
+    result = deque(maxlen=lines)
+    for path in log_file_handler.segments_between(start, end):
+        opener = gzip.open if path.endswith('.gz') else open
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            
-            msg = MIMEText(message)
-            msg['Subject'] = title
-            msg['From'] = CONFIG['notifications']['email']['username']
-            msg['To'] = CONFIG['notifications']['email']['to_email']
-            
-            server = smtplib.SMTP(
-                CONFIG['notifications']['email']['smtp_server'],
-                CONFIG['notifications']['email']['smtp_port']
-            )
-            server.starttls()
-            server.login(
-                CONFIG['notifications']['email']['username'],
-                CONFIG['notifications']['email']['password']
-            )
-            server.send_message(msg)
-            server.quit()
-            logger.info(f"Email inviata: {title}")
-        except Exception as e:
-            logger.error(f"Errore invio email: {e}")
+            with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+                included = False
+                for line in f:
+                    stamp = line[:19]
+                    # Righe senza timestamp (traceback) seguono la riga precedente
+                    if len(stamp) == 19 and stamp[4] == '-' and stamp[10] == ' ':
+                        if end is not None and stamp > end:
+                            break
+                        included = start is None or stamp >= start
+                    if included:
+                        result.append(line.rstrip('\n'))
+        except FileNotFoundError:
+            continue
+    return list(result)
 
 # =====================================================================
-# SYSTEM MONITOR
+# LOG STREAMING
 # =====================================================================
 
-def get_system_info():
-    """Informazioni sistema"""
-    try:
-        cpu = psutil.cpu_percent(interval=1)
-        mem = psutil.virtual_memory()
-        disk = psutil.disk_usage('C:\\')
-        
-        # Uptime
-        boot_time = psutil.boot_time()
-        uptime_seconds = time.time() - boot_time
-        uptime_str = str(timedelta(seconds=int(uptime_seconds)))
-        
-        # Processi
-        xibo_running = any('xibo' in p.name().lower() for p in psutil.process_iter(['name']))
-        
-        return {
-            'cpu': cpu,
-            'memory': mem.percent,
-            'disk': disk.percent,
-            'uptime': uptime_str,
-            'xibo_running': xibo_running
-        }
-    except Exception as e:
-        logger.error(f"Errore lettura info sistema: {e}")
-        return None
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
 
-# =====================================================================
-# WEBSOCKET BROADCAST
-# =====================================================================
+def _log_line_matches(line, level=None, keyword=None):
+    if level:
+        parts = line.split(' - ', 3)
+        line_level = LOG_LEVELS.get(parts[2], 0) if len(parts) >= 3 else 0
+        if line_level < LOG_LEVELS.get(level, 0):
+            return False
+    if keyword and keyword.lower() not in line.lower():
+        return False
+    return True
 
-def broadcast_status_update():
-    """Invia aggiornamento stato a tutti i client connessi"""
-    try:
-        socketio.emit('status_update', {
-            'display': display_controller.status,
-            'system': get_system_info(),
-            'schedule': {
-                'enabled': CONFIG['schedule']['enabled'],
-                'in_schedule': is_in_schedule()
-            }
-        })
-    except:
-        pass
+class LogFollower:
+    """
+    Segue il file di log come `tail -f` e invia solo le nuove righe ai client
+    iscritti, ciascuno con i propri filtri (livello minimo, parola chiave).
+    Il file viene controllato in polling (stat): funziona anche su Windows e
+    rileva rotazione/troncamento tramite inode e size.
+    """
+
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.subscribers = {}
+        self._cursor = None
+        self._file_id = None
+        self._lock = threading.Lock()
+        # Serializza poll e nuove iscrizioni sullo stesso cursore
+        self._poll_lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, sid, level=None, keyword=None, backlog=200):
+        """
+        Iscrive il client e gli invia le ultime righe (reset): backlog e
+        aggiornamenti successivi partono dallo stesso cursore, senza righe perse.
+        """
+        filters = {'level': level, 'keyword': keyword}
+        with self._poll_lock:
+            with self._lock:
+                self.subscribers.pop(sid, None)
+            try:
+                if self._cursor is None:
+                    self._file_changed()
+                    with open(self.path, 'rb') as f:
+                        _, self._cursor = _tail_file(f, 1)
+                else:
+                    # Consegna agli altri iscritti le righe in sospeso
+                    self.poll()
+                with open(self.path, 'rb') as f:
+                    lines = _read_tail(f, 0, self._cursor, backlog * 5 if any(filters.values()) else backlog)
+            except FileNotFoundError:
+                lines = []
+            selected = [l for l in lines if _log_line_matches(l, **filters)][-backlog:]
+            socketio.emit('log_lines', {'lines': selected, 'reset': True}, to=sid)
+            with self._lock:
+                self.subscribers[sid] = filters
+        self.start()
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            self.subscribers.pop(sid, None)
+
+    def _file_changed(self):
+        """True se il file è stato ruotato/sostituito dall'ultima lettura"""
+        st = os.stat(self.path)
+        file_id = (st.st_dev, st.st_ino)
+        changed = self._file_id is not None and file_id != self._file_id
+        self._file_id = file_id
+        if self._cursor is not None and st.st_size < self._cursor:
+            changed = True
+        return changed, st.st_size
+
+    def poll(self):
+        changed, size = self._file_changed()
+        if self._cursor is None:
+            self._cursor = size
+            return
+        if changed:
+            self._cursor = 0
+        elif size == self._cursor:
+            return
+
+        lines = []
+        with open(self.path, 'rb') as f:
+            while True:
+                # Letture da 1000 righe fino a raggiungere la fine del file
+                batch, self._cursor = _tail_file(f, 1000, self._cursor)
+                lines.extend(batch)
+                if len(batch) < 1000:
+                    break
+        if not lines:
+            return
+
+        with self._lock:
+            subscribers = list(self.subscribers.items())
+        for sid, filters in subscribers:
+            selected = [l for l in lines if _log_line_matches(l, **filters)]
+            if selected:
+                socketio.emit('log_lines', {'lines': selected}, to=sid)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._poll_lock:
+                if not self.subscribers:
+                    # Nessun iscritto: alla ripresa si riparte dalla fine del file
+                    self._cursor = None
+                    continue
+                try:
+                    self.poll()
+                except FileNotFoundError:
+                    self._cursor = 0
+                except Exception as e:
+                    logger.error(f"Errore streaming log: {e}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='log-follower', daemon=True)
+            self._thread.start()
+
+# Istanza globale follower
+log_follower = LogFollower(os.path.join(LOG_DIR, 'display.log'))
 
 # =====================================================================
 # DECORATORI
@@ -554,25 +3245,61 @@ def api_source(source):
 @app.route('/api/display/status')
 @login_required
 def api_status():
-    display_controller.check_status()
+    snapshot = display_controller.get_snapshot()
+    cache_age = display_controller.status_age()
+    payload = build_status_payload()
+    payload['cache_age'] = round(cache_age, 1) if cache_age is not None else None
+    payload['snapshot'] = snapshot.to_dict() if snapshot is not None else None
+    return jsonify(payload)
+
+@app.route('/api/fleet')
+@login_required
+def api_fleet():
+    return jsonify(fleet.describe())
+
+def _fleet_response(target, action):
+    try:
+        results = action()
+    except KeyError:
+        return jsonify({'success': False, 'error': f'Target sconosciuto: {target}'}), 404
     return jsonify({
-        'display': display_controller.status,
-        'system': get_system_info(),
-        'schedule': {
-            'enabled': CONFIG['schedule']['enabled'],
-            'in_schedule': is_in_schedule()
-        }
+        'success': all(r['success'] for r in results.values()),
+        'target': target,
+        'results': results
     })
 
+@app.route('/api/fleet/<target>/power/<state>', methods=['POST'])
+@login_required
+def api_fleet_power(target, state):
+    logger.info(f"Comando fleet power_{state} su {target} da {request.remote_addr}")
+    if state == 'on':
+        return _fleet_response(target, lambda: fleet.power_on(target))
+    elif state == 'off':
+        return _fleet_response(target, lambda: fleet.power_off(target))
+    return jsonify({'success': False, 'error': 'Stato non valido'}), 400
+
+@app.route('/api/fleet/<target>/source/<source>', methods=['POST'])
+@login_required
+def api_fleet_source(target, source):
+    logger.info(f"Comando fleet source_{source} su {target} da {request.remote_addr}")
+    return _fleet_response(target, lambda: fleet.set_source(target, source))
+
+@app.route('/api/fleet/<target>/status')
+@login_required
+def api_fleet_status(target):
+    return _fleet_response(target, lambda: fleet.check_status(target))
+
 @app.route('/api/config', methods=['GET', 'POST'])
 @login_required
 def api_config():
     if request.method == 'POST':
         try:
-            new_config = request.json
+            # Le sezioni inviate si sommano a quelle esistenti
+            new_config = merge_config(CONFIG, request.json)
             
             # Valida configurazione
             # (aggiungi validazione necessaria)
+            WeeklySchedule(new_config['schedule'])
             
             # Salva
             with open(CONFIG_FILE, 'w') as f:
@@ -580,7 +3307,10 @@ def api_config():
             
             # Ricarica
             CONFIG.update(new_config)
-            setup_scheduler()
+            weekly_schedule.configure(CONFIG['schedule'])
+            scheduler.wake()
+            if 'watchdog' in request.json:
+                watchdog_supervisor.wake()
             
             logger.info("Configurazione aggiornata")
             return jsonify({'success': True, 'message': 'Configurazione salvata'})
@@ -593,29 +3323,147 @@ def api_config():
 @app.route('/api/logs')
 @login_required
 def api_logs():
+    lines = min(max(request.args.get('lines', 100, type=int), 1), 5000)
+    since = request.args.get('since')
+    start = request.args.get('from')
+    end = request.args.get('to')
     try:
-        with open(os.path.join(LOG_DIR, 'display.log'), 'r') as f:
-            logs = f.readlines()[-100:]  # Ultimi 100
-        return jsonify({'logs': [l.strip() for l in reversed(logs)]})
+        if start or end:
+            # Date ISO (2024-01-15T10:30) normalizzate al formato del log
+            start = start.replace('T', ' ') if start else None
+            end = end.replace('T', ' ') if end else None
+            if end:
+                # Estremo finale inclusivo: '2024-01-15' → '2024-01-15 23:59:59'
+                end = end + '9999-12-31 23:59:59'[len(end):]
+            logs = read_log_range(start, end, lines)
+            return jsonify({'logs': list(reversed(logs))})
+
+        logs, cursor = tail_log(os.path.join(LOG_DIR, 'display.log'), lines, since)
+        return jsonify({'logs': list(reversed(logs)), 'cursor': cursor})
     except Exception as e:
-        return jsonify({'logs': [f'Errore lettura log: {e}']})
+        return jsonify({'logs': [f'Errore lettura log: {e}'], 'cursor': since})
+
+def _parse_time_arg(name):
+    """Parametro data ISO (o epoch) della query string convertito in epoch"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/history')
+@login_required
+def api_history():
+    try:
+        start = _parse_time_arg('from')
+        end = _parse_time_arg('to')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Data non valida'}), 400
+
+    types = request.args.get('type')
+    events = event_store.query(
+        start=start,
+        end=end,
+        types=set(types.split(',')) if types else None,
+        display=request.args.get('display'),
+        limit=min(max(request.args.get('limit', 500, type=int), 1), 10000)
+    )
+    return jsonify({'events': events, 'count': len(events), 'types': event_store.types()})
+
+@app.route('/api/metrics/timeseries')
+@login_required
+def api_timeseries():
+    try:
+        start = _parse_time_arg('from')
+        end = _parse_time_arg('to')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Data non valida'}), 400
+
+    resolution = request.args.get('resolution')
+    if resolution is None:
+        # Risoluzione scelta in base all'ampiezza del range richiesto
+        span = (end or time.time()) - (start or time.time() - 86400)
+        resolution = 'minute' if span <= 6 * 3600 else 'hour' if span <= 14 * 86400 else 'day'
+    if resolution not in TIMESERIES_RESOLUTIONS:
+        return jsonify({'success': False, 'error': 'Risoluzione non valida'}), 400
+
+    display = request.args.get('display', display_controller.key)
+    points = request.args.get('points', type=int)
+    return jsonify({
+        'display': display,
+        'resolution': resolution,
+        'series': timeseries_store.series(display, resolution, start, end, points)
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Endpoint Prometheus/OpenMetrics (token opzionale: metrics.token)"""
+    token = CONFIG.get('metrics', {}).get('token')
+    if token:
+        supplied = request.headers.get('Authorization', '').replace('Bearer ', '', 1) or request.args.get('token')
+        if not secrets.compare_digest(supplied or '', token):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(
+        metrics_registry.expose(),
+        content_type='application/openmetrics-text; version=1.0.0; charset=utf-8'
+    )
 
 @app.route('/api/test/notification', methods=['POST'])
 @login_required
 def test_notification():
-    send_notification("🧪 Test Notifica", "Questo è un test del sistema di notifiche")
+    send_notification("🧪 Test Notifica", "Questo è un test del sistema di notifiche", force=True)
     return jsonify({'success': True, 'message': 'Notifica di test inviata'})
 
+@app.route('/api/notifications/stats')
+@login_required
+def api_notification_stats():
+    return jsonify(notification_dispatcher.stats())
+
 # WebSocket handlers
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"Client connesso: {request.sid}")
+    join_room(STATUS_ROOM)
+    status_watcher.add_viewer(request.sid)
     emit('connected', {'message': 'Connesso al server'})
+    emit('status_update', status_broadcaster.current())
     broadcast_status_update()
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    status_watcher.remove_viewer(request.sid)
+    log_follower.unsubscribe(request.sid)
+
+@socketio.on('logs_subscribe')
+def handle_logs_subscribe(data):
+    if 'logged_in' not in session:
+        return
+    data = data or {}
+    level = data.get('level') if data.get('level') in LOG_LEVELS else None
+    keyword = (data.get('keyword') or '').strip() or None
+
+    log_follower.subscribe(request.sid, level, keyword)
+
+@socketio.on('logs_unsubscribe')
+def handle_logs_unsubscribe():
+    log_follower.unsubscribe(request.sid)
+
+@socketio.on('status_resync')
+def handle_status_resync(data):
+    """Client rimasto indietro: patch mancanti o snapshot completo"""
+    seq = (data or {}).get('seq')
+    patches = status_broadcaster.since(seq) if isinstance(seq, int) else None
+    if patches is None:
+        emit('status_update', status_broadcaster.current())
+        return
+    for patch in patches:
+        emit('status_patch', patch)
+
 @socketio.on('request_status')
 def handle_status_request():
-    display_controller.check_status()
+    display_controller.get_status()
     broadcast_status_update()
 
 # =====================================================================
@@ -1225,6 +4073,21 @@ DASHBOARD_HTML = """
         <div class="modal-content">
             <span class="modal-close" onclick="closeModal('logsModal')">&times;</span>
             <h3>📋 System Logs</h3>
+            <div class="stat-grid">
+                <div class="form-group">
+                    <label>Level</label>
+                    <select id="logsLevel" onchange="subscribeLogs()">
+                        <option value="">All</option>
+                        <option value="INFO">INFO+</option>
+                        <option value="WARNING">WARNING+</option>
+                        <option value="ERROR">ERROR+</option>
+                    </select>
+                </div>
+                <div class="form-group">
+                    <label>Keyword</label>
+                    <input type="text" id="logsKeyword" onchange="subscribeLogs()">
+                </div>
+            </div>
             <div class="logs-container" id="logsContent">
                 Loading logs...
             </div>
@@ -1237,18 +4100,57 @@ DASHBOARD_HTML = """
     <script>
         const socket = io();
         let statusData = null;
+        let statusSeq = null;
+        let resyncPending = false;
 
         // Socket connection
+        // Lo stato arriva in push dal server (snapshot alla connessione, poi patch)
         socket.on('connect', () => {
             console.log('Connected to server');
-            socket.emit('request_status');
         });
 
+        // Snapshot completo
         socket.on('status_update', (data) => {
             statusData = data;
+            statusSeq = data.seq;
+            resyncPending = false;
             updateUI(data);
         });
 
+        // Solo i campi cambiati rispetto al seq precedente
+        socket.on('status_patch', (patch) => {
+            if (statusSeq !== null && patch.seq <= statusSeq) return;
+            if (statusData === null || patch.base !== statusSeq) {
+                if (!resyncPending) {
+                    resyncPending = true;
+                    socket.emit('status_resync', { seq: statusSeq });
+                }
+                return;
+            }
+            applyPatch(statusData, patch);
+            statusSeq = patch.seq;
+            resyncPending = false;
+            updateUI(statusData);
+        });
+
+        function applyPatch(target, patch) {
+            patch.changes.forEach(([path, value]) => {
+                let node = target;
+                path.slice(0, -1).forEach(key => {
+                    if (node[key] === null || typeof node[key] !== 'object') node[key] = {};
+                    node = node[key];
+                });
+                node[path[path.length - 1]] = value;
+            });
+            patch.removed.forEach(path => {
+                let node = target;
+                for (const key of path.slice(0, -1)) {
+                    node = node ? node[key] : undefined;
+                }
+                if (node) delete node[path[path.length - 1]];
+            });
+        }
+
         // Update UI with status data
         function updateUI(data) {
             // Display status
@@ -1288,7 +4190,11 @@ DASHBOARD_HTML = """
                 
                 document.getElementById('systemUptime').textContent = sys.uptime;
                 
-                document.getElementById('xiboStatus').textContent = sys.xibo_running ? '✅ Running' : '❌ Not Running';
+                let xiboText = sys.xibo_running ? '✅ Running' : '❌ Not Running';
+                if (sys.xibo && sys.xibo.running && sys.xibo.rss_mb !== null) {
+                    xiboText += ` (${sys.xibo.cpu.toFixed(0)}% · ${sys.xibo.rss_mb} MB)`;
+                }
+                document.getElementById('xiboStatus').textContent = xiboText;
             }
 
             // Schedule info
@@ -1321,7 +4227,6 @@ DASHBOARD_HTML = """
                 
                 if (data.success) {
                     showToast('✅ ' + data.message, 'success');
-                    setTimeout(() => socket.emit('request_status'), 2000);
                 } else {
                     showToast('❌ Command failed', 'error');
                 }
@@ -1373,39 +4278,49 @@ DASHBOARD_HTML = """
                 });
         }
 
+        // Log live: il server invia solo le nuove righe (già filtrate)
+        function renderLogEntry(log) {
+            const entry = document.createElement('div');
+            entry.className = 'log-entry';
+            
+            // Parse log line
+            const parts = log.split(' - ');
+            if (parts.length >= 3) {
+                const level = parts[2];
+                entry.innerHTML = `
+                    <span class="log-time">${parts[0]}</span>
+                    <span class="log-level-${level}">${level}</span>
+                    <span>${parts.slice(3).join(' - ')}</span>
+                `;
+            } else {
+                entry.textContent = log;
+            }
+            return entry;
+        }
+
+        socket.on('log_lines', (data) => {
+            const logsDiv = document.getElementById('logsContent');
+            if (data.reset) logsDiv.innerHTML = '';
+            data.lines.forEach(log => logsDiv.prepend(renderLogEntry(log)));
+            while (logsDiv.childNodes.length > 1000) logsDiv.removeChild(logsDiv.lastChild);
+        });
+
+        function subscribeLogs() {
+            socket.emit('logs_subscribe', {
+                level: document.getElementById('logsLevel').value,
+                keyword: document.getElementById('logsKeyword').value
+            });
+        }
+
         function openLogsModal() {
-            fetch('/api/logs')
-                .then(r => r.json())
-                .then(data => {
-                    const logsDiv = document.getElementById('logsContent');
-                    logsDiv.innerHTML = '';
-                    
-                    data.logs.forEach(log => {
-                        const entry = document.createElement('div');
-                        entry.className = 'log-entry';
-                        
-                        // Parse log line
-                        const parts = log.split(' - ');
-                        if (parts.length >= 3) {
-                            const level = parts[2];
-                            entry.innerHTML = `
-                                <span class="log-time">${parts[0]}</span>
-                                <span class="log-level-${level}">${level}</span>
-                                <span>${parts.slice(3).join(' - ')}</span>
-                            `;
-                        } else {
-                            entry.textContent = log;
-                        }
-                        
-                        logsDiv.appendChild(entry);
-                    });
-                    
-                    document.getElementById('logsModal').style.display = 'flex';
-                });
+            document.getElementById('logsContent').innerHTML = 'Loading logs...';
+            subscribeLogs();
+            document.getElementById('logsModal').style.display = 'flex';
         }
 
         function closeModal(id) {
             document.getElementById(id).style.display = 'none';
+            if (id === 'logsModal') socket.emit('logs_unsubscribe');
         }
 
         // Save configuration
@@ -1471,16 +4386,13 @@ DASHBOARD_HTML = """
         setInterval(updateTime, 1000);
         updateTime();
 
-        // Auto-refresh status every 30 seconds
-        setInterval(() => {
-            socket.emit('request_status');
-        }, 30000);
-
         // Close modals on ESC
         document.addEventListener('keydown', (e) => {
             if (e.key === 'Escape') {
                 closeModal('configModal');
-                closeModal('logsModal');
+                if (document.getElementById('logsModal').style.display === 'flex') {
+                    closeModal('logsModal');
+                }
             }
         });
     </script>
@@ -1494,31 +4406,42 @@ DASHBOARD_HTML = """
 
 if __name__ == '__main__':
     print("=" * 70)
-    print("🖥️  DISPLAY CONTROL SYSTEM (DEBUG MODE)")
+    print("🖥️  DISPLAY CONTROL SYSTEM")
     print("=" * 70)
 
     try:
         print("→ Lettura configurazione...")
         print(f"Display: {CONFIG['display']['name']} ({CONFIG['display']['ip']})")
         print(f"Location: {CONFIG['display']['location']}")
+        print(f"Fleet: {len(fleet.controllers)} display, {len(fleet.groups)} gruppi")
         print(f"Schedule: {'Enabled' if CONFIG['schedule']['enabled'] else 'Disabled'}")
         print(f"Watchdog: {'Enabled' if CONFIG['watchdog']['enabled'] else 'Disabled'}")
         print(f"Telegram: {'Enabled' if CONFIG['notifications']['telegram']['enabled'] else 'Disabled'}")
         print(f"Email: {'Enabled' if CONFIG['notifications']['email']['enabled'] else 'Disabled'}")
 
-        print("\n→ Setup scheduler...")
-        setup_scheduler()
-        print("✅ Scheduler configurato")
-
         print("\n→ Avvio thread scheduler...")
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
+        scheduler_thread = threading.Thread(target=scheduler.run, daemon=True)
         scheduler_thread.start()
         print("✅ Thread scheduler avviato")
 
-        print("\n→ Avvio thread watchdog...")
-        watchdog_thread = threading.Thread(target=run_watchdog, daemon=True)
-        watchdog_thread.start()
-        print("✅ Thread watchdog avviato")
+        print("\n→ Avvio sampler metriche di sistema...")
+        system_sampler.start()
+        print("✅ Sampler avviato")
+
+        timeseries_store.start()
+
+        print("\n→ Avvio event loop asyncio...")
+        event_loop.start()
+        event_loop.call_every(max(1, mdc_pool.keepalive_interval / 2), mdc_pool.maintain)
+        print("✅ Event loop avviato")
+
+        print("\n→ Avvio watchdog...")
+        watchdog_supervisor.start()
+        print(f"✅ Watchdog avviato ({len(watchdog_supervisor.watchdogs)} display)")
+
+        print("\n→ Avvio status watcher...")
+        status_watcher.start()
+        print("✅ Status watcher avviato")
 
         print("\n→ Verifica stato iniziale display...")
         display_controller.check_status()
@@ -1538,4 +4461,13 @@ if __name__ == '__main__':
         traceback.print_exc()
 
     finally:
+        try:
+            timeseries_store.flush()
+        except Exception:
+            pass
+        try:
+            run_async(mdc_pool.close_all(), timeout=5)
+        except Exception:
+            pass
+        event_loop.stop()
         print("\n🔚 Script terminato.")
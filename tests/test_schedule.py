@@ -0,0 +1,171 @@
+"""
+Test dello schedule compilato (WeeklySchedule) e del recupero delle
+transizioni perse (Scheduler._missed).
+
+display_system crea config.json, logs/ e data/ nella directory corrente
+all'import: il modulo viene importato da una directory temporanea.
+"""
+
+import importlib
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_socketio')
+pytest.importorskip('samsung_mdc')
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+ALL_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+@pytest.fixture(scope='module')
+def ds(tmp_path_factory):
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('display_system'))
+    sys.path.insert(0, SRC_DIR)
+    try:
+        yield importlib.import_module('display_system')
+    finally:
+        sys.path.remove(SRC_DIR)
+        os.chdir(cwd)
+
+
+def schedule(ds, windows, holidays=()):
+    return ds.WeeklySchedule({'enabled': True, 'windows': windows, 'holidays': list(holidays)})
+
+
+def at(text):
+    # 2024-01-01 è un lunedì
+    return datetime.strptime(text, '%Y-%m-%d %H:%M')
+
+
+# ---------------------------------------------------------------------
+# contains
+# ---------------------------------------------------------------------
+
+def test_contains_weekday_window(ds):
+    plan = schedule(ds, [{'days': ['monday'], 'power_on': '08:00', 'power_off': '20:00'}])
+    assert not plan.contains(at('2024-01-01 07:59'))
+    assert plan.contains(at('2024-01-01 08:00'))
+    assert plan.contains(at('2024-01-01 19:59'))
+    assert not plan.contains(at('2024-01-01 20:00'))
+    assert not plan.contains(at('2024-01-02 12:00'))
+
+
+def test_contains_overnight_window(ds):
+    plan = schedule(ds, [{'days': ['friday'], 'power_on': '22:00', 'power_off': '02:00'}])
+    assert plan.contains(at('2024-01-05 23:00'))
+    assert plan.contains(at('2024-01-06 01:59'))
+    assert not plan.contains(at('2024-01-06 02:00'))
+    assert not plan.contains(at('2024-01-05 21:59'))
+
+
+def test_contains_sunday_window_wraps_to_monday(ds):
+    plan = schedule(ds, [{'days': ['sunday'], 'power_on': '20:00', 'power_off': '04:00'}])
+    assert plan.contains(at('2024-01-07 23:00'))
+    assert plan.contains(at('2024-01-08 03:00'))
+    assert not plan.contains(at('2024-01-08 04:00'))
+
+
+def test_contains_holiday(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '08:00', 'power_off': '20:00'}],
+                    holidays=['2024-01-03', '12-25'])
+    assert not plan.contains(at('2024-01-03 12:00'))
+    assert plan.contains(at('2024-01-04 12:00'))
+    assert not plan.contains(at('2024-12-25 12:00'))
+    assert not plan.contains(at('2025-12-25 12:00'))
+
+
+def test_contains_holiday_overnight_tail(ds):
+    plan = schedule(ds, [{'days': ['friday', 'saturday'], 'power_on': '22:00', 'power_off': '02:00'}],
+                    holidays=['2024-01-05'])
+    # La finestra iniziata nel festivo resta spenta anche dopo mezzanotte
+    assert not plan.contains(at('2024-01-05 23:00'))
+    assert not plan.contains(at('2024-01-06 01:00'))
+    assert plan.contains(at('2024-01-06 23:00'))
+    assert plan.contains(at('2024-01-07 01:00'))
+
+
+# ---------------------------------------------------------------------
+# next_transition
+# ---------------------------------------------------------------------
+
+def test_next_transition_weekday_window(ds):
+    plan = schedule(ds, [{'days': ['monday', 'tuesday'], 'power_on': '08:00', 'power_off': '20:00'}])
+    assert plan.next_transition(at('2024-01-01 07:00')) == (at('2024-01-01 08:00'), 'on')
+    assert plan.next_transition(at('2024-01-01 08:00')) == (at('2024-01-01 20:00'), 'off')
+    assert plan.next_transition(at('2024-01-02 21:00')) == (at('2024-01-08 08:00'), 'on')
+
+
+def test_next_transition_overnight_window(ds):
+    plan = schedule(ds, [{'days': ['friday'], 'power_on': '22:00', 'power_off': '02:00'}])
+    assert plan.next_transition(at('2024-01-05 23:00')) == (at('2024-01-06 02:00'), 'off')
+
+
+def test_next_transition_no_midnight_change_across_sunday(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '18:00', 'power_off': '02:00'}])
+    assert plan.next_transition(at('2024-01-07 23:00')) == (at('2024-01-08 02:00'), 'off')
+
+
+def test_next_transition_skips_holiday(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '08:00', 'power_off': '20:00'}],
+                    holidays=['2024-01-03'])
+    assert plan.next_transition(at('2024-01-02 21:00')) == (at('2024-01-04 08:00'), 'on')
+
+
+def test_next_transition_always_on_with_holiday(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '00:00', 'power_off': '24:00'}],
+                    holidays=['12-25'])
+    assert plan.contains(at('2024-12-24 20:00'))
+    assert not plan.contains(at('2024-12-25 20:00'))
+    assert plan.next_transition(at('2024-12-24 20:00')) == (at('2024-12-25 00:00'), 'off')
+    assert plan.next_transition(at('2024-12-25 20:00')) == (at('2024-12-26 00:00'), 'on')
+
+
+def test_next_transition_never_changes(ds):
+    always_on = schedule(ds, [{'days': ALL_DAYS, 'power_on': '00:00', 'power_off': '24:00'}])
+    assert always_on.next_transition(at('2024-01-01 12:00')) is None
+    disabled = ds.WeeklySchedule({'enabled': False, 'holidays': ['12-25']})
+    assert disabled.next_transition(at('2024-01-01 12:00')) is None
+
+
+# ---------------------------------------------------------------------
+# Scheduler._missed
+# ---------------------------------------------------------------------
+
+def scheduler(ds, plan, checkpoint):
+    runner = ds.Scheduler(plan, {'on': lambda: None, 'off': lambda: None})
+    runner.checkpoint = checkpoint
+    return runner
+
+
+def test_missed_lists_transitions_in_order(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '08:00', 'power_off': '20:00'}])
+    runner = scheduler(ds, plan, at('2024-01-01 07:00'))
+    assert runner._missed(at('2024-01-02 09:00')) == [
+        (at('2024-01-01 08:00'), 'on'),
+        (at('2024-01-01 20:00'), 'off'),
+        (at('2024-01-02 08:00'), 'on'),
+    ]
+
+
+def test_missed_bounds(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '08:00', 'power_off': '20:00'}])
+    # Checkpoint escluso, now incluso
+    runner = scheduler(ds, plan, at('2024-01-01 08:00'))
+    assert runner._missed(at('2024-01-01 20:00')) == [(at('2024-01-01 20:00'), 'off')]
+    assert runner._missed(at('2024-01-01 19:59')) == []
+
+
+def test_missed_across_holiday(ds):
+    plan = schedule(ds, [{'days': ALL_DAYS, 'power_on': '00:00', 'power_off': '24:00'}],
+                    holidays=['12-25'])
+    runner = scheduler(ds, plan, at('2024-12-24 12:00'))
+    assert runner._missed(at('2024-12-26 12:00')) == [
+        (at('2024-12-25 00:00'), 'off'),
+        (at('2024-12-26 00:00'), 'on'),
+    ]